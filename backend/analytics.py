@@ -0,0 +1,191 @@
+"""
+Ticket analytics over the hourly / daily rollup tables
+
+    python analytics.py --backfill                 # rebuild rollups from all tickets
+    python analytics.py --start 2024-01-01 --end 2024-02-01 --group-by category
+
+Database keeps ticket_rollups up to date on every create, status change,
+reclassification, admin update and delete, and builds them from the hot
+tickets the first time it opens a database that has none. Run the backfill
+to bring archived tickets into the history. It locks the database for
+writes while it runs.
+"""
+from datetime import datetime, timedelta
+import argparse
+import time
+import os
+
+from archive import TicketArchive
+from models import Database, ROLLUP_COLUMNS, rollup_period
+
+GROUP_COLUMNS = ('category', 'priority')
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+# Period length per bucket, and the default range when a query has no start
+STEP = {'hour': timedelta(hours=1), 'day': timedelta(days=1)}
+DEFAULT_SPAN = {'hour': timedelta(hours=48), 'day': timedelta(days=30)}
+
+
+def parse_time(value):
+    """'2024-05-01' or '2024-05-01T13:00:00' -> '2024-05-01 13:00:00'"""
+    return datetime.fromisoformat(value).strftime(TIME_FORMAT)
+
+
+def period_range(bucket, start, end):
+    """First period overlapping [start, end) and the first period after it"""
+    last = rollup_period(bucket, end)
+    last_start = datetime.strptime(last if bucket == 'hour' else last + ' 00:00:00', TIME_FORMAT)
+    if last_start < datetime.strptime(end, TIME_FORMAT):
+        last = rollup_period(bucket, (last_start + STEP[bucket]).strftime(TIME_FORMAT))
+    return rollup_period(bucket, start), last
+
+
+class TicketAnalytics:
+    """Range queries and backfill for ticket_rollups"""
+
+    def __init__(self, db, archive=None):
+        self.db = db
+        self.archive = archive
+
+    def backfill(self):
+        """
+        Rebuild every rollup row from the tickets (and the archive, when given)
+
+        Returns:
+            int: rollup rows written
+        """
+        conn = self.db.get_connection()
+        sources = ['main.tickets']
+        if self.archive is not None and os.path.exists(self.archive.archive_path):
+            conn.execute('ATTACH DATABASE ? AS archive', (self.archive.archive_path,))
+            sources.append('archive.tickets')
+
+        written = Database.rebuild_rollups(conn.cursor(), sources)
+        conn.commit()
+        conn.close()
+        return written
+
+    def query(self, start=None, end=None, bucket='day', category=None, priority=None, group_by=None):
+        """
+        Tickets created and closed, average time to close and open backlog
+        per period in [start, end)
+
+        Periods without any activity are left out; the backlog carries over
+        unchanged across them.
+
+        Returns:
+            dict: {'bucket', 'start', 'end', 'group_by', 'series', 'totals'}
+        """
+        if bucket not in STEP:
+            raise ValueError(f'bucket must be one of: {", ".join(STEP)}')
+        if group_by is not None and group_by not in GROUP_COLUMNS:
+            raise ValueError(f'group_by must be one of: {", ".join(GROUP_COLUMNS)}')
+
+        end = parse_time(end) if end else Database.now()
+        start = parse_time(start) if start else (
+            datetime.strptime(end, TIME_FORMAT) - DEFAULT_SPAN[bucket]
+        ).strftime(TIME_FORMAT)
+        if start >= end:
+            raise ValueError('start must be before end')
+        start_period, end_period = period_range(bucket, start, end)
+
+        group = group_by or "'all'"
+        filters, params = '', []
+        if category:
+            filters += ' AND category = ?'
+            params.append(category)
+        if priority:
+            filters += ' AND priority = ?'
+            params.append(priority)
+
+        conn = self.db.get_connection()
+        cursor = conn.cursor()
+
+        # Backlog before the range: whole days first, then the hours of the first day
+        start_day = start_period[:10]
+        cursor.execute(f'''
+            SELECT {group} AS grp, SUM(backlog) AS backlog FROM ticket_rollups
+            WHERE ((bucket = 'day' AND period < ?)
+                   OR (bucket = 'hour' AND period >= ? AND period < ?)){filters}
+            GROUP BY grp
+        ''', [start_day, start_day, start_period if bucket == 'hour' else start_day] + params)
+        backlog = {row['grp']: row['backlog'] for row in cursor.fetchall()}
+
+        cursor.execute(f'''
+            SELECT period, {group} AS grp,
+                   SUM(created) AS created, SUM(closed) AS closed,
+                   SUM(close_seconds) AS close_seconds, SUM(backlog) AS backlog
+            FROM ticket_rollups
+            WHERE bucket = ? AND period >= ? AND period < ?{filters}
+            GROUP BY period, grp
+            ORDER BY period, grp
+        ''', [bucket, start_period, end_period] + params)
+        rows = cursor.fetchall()
+        conn.close()
+
+        series = []
+        totals = dict.fromkeys(ROLLUP_COLUMNS[:3], 0)
+        for row in rows:
+            backlog[row['grp']] = backlog.get(row['grp'], 0) + row['backlog']
+            point = {
+                'period': row['period'],
+                'created': row['created'],
+                'closed': row['closed'],
+                'avg_close_hours': round(row['close_seconds'] / row['closed'] / 3600, 2) if row['closed'] else None,
+                'backlog': backlog[row['grp']],
+            }
+            if group_by:
+                point[group_by] = row['grp']
+            series.append(point)
+            for column in totals:
+                totals[column] += row[column]
+
+        return {
+            'bucket': bucket,
+            'start': start_period,
+            'end': end_period,
+            'group_by': group_by,
+            'series': series,
+            'totals': {
+                'created': totals['created'],
+                'closed': totals['closed'],
+                'avg_close_hours': round(totals['close_seconds'] / totals['closed'] / 3600, 2)
+                if totals['closed'] else None,
+            },
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Ticket rollup backfill and range queries')
+    parser.add_argument('--db', default='database/ticket_system.db', help='Database file (relative to backend/)')
+    parser.add_argument('--archive', default='database/ticket_archive.db',
+                        help='Archive included in the backfill ("" to leave it out)')
+    parser.add_argument('--backfill', action='store_true', help='Rebuild rollups from tickets and the archive')
+    parser.add_argument('--start', help='Range start (ISO date or time)')
+    parser.add_argument('--end', help='Range end, exclusive (default: now)')
+    parser.add_argument('--bucket', choices=list(STEP), default='day')
+    parser.add_argument('--category')
+    parser.add_argument('--priority')
+    parser.add_argument('--group-by', choices=GROUP_COLUMNS)
+    args = parser.parse_args()
+
+    db = Database(args.db)
+    analytics = TicketAnalytics(db, TicketArchive(db, args.archive) if args.archive else None)
+
+    if args.backfill:
+        print("\n📊 Rebuilding ticket rollups...")
+        started = time.time()
+        written = analytics.backfill()
+        print(f"✅ Wrote {written:,} rollup rows in {time.time() - started:.1f}s\n")
+    else:
+        result = analytics.query(args.start, args.end, args.bucket, args.category, args.priority, args.group_by)
+        label = f" {args.group_by}" if args.group_by else ''
+        print(f"\n📊 Tickets per {result['bucket']} from {result['start']} to {result['end']}\n")
+        print(f"{'period':<20}{label:<18}{'created':>9}{'closed':>9}{'avg close h':>13}{'backlog':>9}")
+        for point in result['series']:
+            avg = point['avg_close_hours']
+            print(f"{point['period']:<20}{str(point.get(args.group_by, '')):<18}{point['created']:>9}"
+                  f"{point['closed']:>9}{'-' if avg is None else avg:>13}{point['backlog']:>9}")
+        totals = result['totals']
+        print(f"\nTotal: {totals['created']:,} created, {totals['closed']:,} closed, "
+              f"avg time to close {totals['avg_close_hours']} h\n")
@@ -1,12 +1,23 @@
-from flask import Flask, request, jsonify, redirect
+from flask import Flask, Response, request, jsonify, redirect
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
-from werkzeug.security import generate_password_hash, check_password_hash
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
+from functools import wraps
+import atexit
+import csv
+import io
 import os
-import sqlite3  # ← Added for admin routes
 
-from models import Database
+from models import (Database, TICKET_COLUMNS, ADMIN_USER_COLUMNS, ADMIN_TICKET_COLUMNS,
+                    ADMIN_USERS_QUERY, ADMIN_TICKETS_QUERY)
+from audit_buffer import AuditBuffer
+from auth import PasswordHasher, HasherBusy, UserCache
+from archive import TicketArchive
+from analytics import TicketAnalytics
+from embedding_store import EmbeddingStore
+from rate_limiter import create_rate_limiter, InferenceGate
+from serialization import FastJSONProvider, dumps, compact_rows, compress_response
 from ml_predictor import TicketPredictor
 
 # Initialize Flask app
@@ -17,15 +28,27 @@ app.config['JWT_TOKEN_LOCATION'] = ['headers']
 app.config['JWT_HEADER_NAME'] = 'Authorization'
 app.config['JWT_HEADER_TYPE'] = 'Bearer'
 
+# orjson-backed jsonify when available
+app.json = FastJSONProvider(app)
+
+# Responses smaller than this are sent uncompressed
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+
 # Enable CORS (allows frontend to communicate with backend)
 CORS(app, resources={
     r"/api/*": {
         "origins": "*",
         "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization"]
+        "allow_headers": ["Content-Type", "Authorization"],
+        "expose_headers": ["Retry-After"]
     }
 })
 
+@app.after_request
+def compress(response):
+    """gzip/brotli responses for clients that accept it"""
+    return compress_response(response, request.headers.get('Accept-Encoding'), COMPRESS_MIN_SIZE)
+
 # Initialize JWT for authentication
 jwt = JWTManager(app)
 
@@ -52,13 +75,107 @@ def revoked_token_callback(jwt_header, jwt_payload):
 
 # Initialize database
 db = Database()
+archive = TicketArchive(db)
+analytics = TicketAnalytics(db, archive)
+
+# Optional write-behind for ticket history and activity rows (AUDIT_WRITE_BEHIND=1)
+audit_buffer = None
+if os.environ.get('AUDIT_WRITE_BEHIND', '0') == '1':
+    audit_buffer = AuditBuffer(
+        db,
+        flush_interval_ms=int(os.environ.get('AUDIT_FLUSH_MS', 200)),
+        max_rows=int(os.environ.get('AUDIT_FLUSH_ROWS', 500))
+    )
+    db.audit_buffer = audit_buffer
+    atexit.register(audit_buffer.close)
+
+# Password hashing off the request threads, and cached user lookups for login
+password_hasher = PasswordHasher(
+    method=os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1'),
+    threads=int(os.environ.get('HASH_THREADS', 2)),
+    max_queue=int(os.environ.get('HASH_MAX_QUEUE', 64))
+)
+user_cache = UserCache(db, ttl=int(os.environ.get('USER_CACHE_TTL', 60)))
+# Records added since the last IVF build are scanned one by one on every
+# duplicate check; past this many they are indexed in the background
+embedding_store = EmbeddingStore(reindex_after=int(os.environ.get('EMBEDDING_REINDEX_AFTER', 10000)))
+
+# With heads on fewer BERT layers, ticket creation skips the final-layer
+# embedding (and the duplicate check) so it gets the speedup too, unless this
+# is set; `python embedding_store.py` embeds the skipped tickets later
+FULL_DEPTH_ON_CREATE = os.environ.get('FULL_DEPTH_ON_CREATE', 'false').lower() == 'true'
+
+# Similarity at or above which a new ticket is flagged as a likely duplicate.
+# Off unless set: raw BERT CLS vectors score above 0.9 even for unrelated
+# text, so the value has to be measured on real tickets (see README)
+DUPLICATE_THRESHOLD = float(os.environ.get('DUPLICATE_THRESHOLD', 0)) or None
 
 # Initialize AI predictor (loads BERT models)
+# Heads trained on fewer BERT layers (train_layers.py) serve faster; with
+# EARLY_EXIT_THRESHOLD set, their unsure predictions finish the encoder
+# and use the full-depth EARLY_EXIT_FALLBACK heads instead
 print("\n🤖 Initializing AI Predictor...")
-predictor = TicketPredictor()
+EARLY_EXIT_THRESHOLD = float(os.environ.get('EARLY_EXIT_THRESHOLD', 0)) or None
+predictor = TicketPredictor(
+    exit_threshold=EARLY_EXIT_THRESHOLD,
+    exit_fallback=os.environ.get('EARLY_EXIT_FALLBACK', 'legacy')
+)
+
+# Every worker polls the model registry so an activated version reaches all of them
+MODEL_WATCH_INTERVAL = int(os.environ.get('MODEL_WATCH_INTERVAL', 30))
+if MODEL_WATCH_INTERVAL > 0:
+    predictor.start_watcher(MODEL_WATCH_INTERVAL)
+
+# Per-user token buckets for the inference endpoints, and load shedding for previews.
+# The in-flight count shares the limiter's store: set RATE_LIMIT_BACKEND=sqlite
+# under multi-worker gunicorn so it counts calls across all workers
+rate_limiter = create_rate_limiter()
+inference_gate = InferenceGate(int(os.environ.get('MAX_INFERENCE_IN_FLIGHT', 4)), rate_limiter.store)
+
+# BERT runs in its own small pool: however many requests are in flight
+# (sync workers or the ASGI thread pool), only this many inferences run at once
+inference_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get('INFERENCE_THREADS', 2)),
+    thread_name_prefix='inference'
+)
 print("✅ Backend ready!\n")
 
 
+def run_inference(text, **kwargs):
+    """Run predictor.predict in the inference pool and wait for the result"""
+    with inference_gate:
+        return inference_executor.submit(predictor.predict, text, **kwargs).result()
+
+
+def retry_later(message, retry_after, status=429):
+    """429/503 response with a Retry-After header (whole seconds)"""
+    retry_after = max(1, int(retry_after + 0.999))
+    response = jsonify({'error': f'{message}. Try again in {retry_after}s', 'retry_after': retry_after})
+    response.headers['Retry-After'] = str(retry_after)
+    return response, status
+
+
+def rate_limited(endpoint, shed_when_overloaded=False):
+    """
+    Apply the token bucket for `endpoint` to the JWT identity (use below
+    @jwt_required). With shed_when_overloaded the request is refused
+    outright while the model is saturated.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if shed_when_overloaded and inference_gate.overloaded():
+                return retry_later('AI service is busy', 1)
+            
+            wait = rate_limiter.check(get_jwt_identity(), endpoint)
+            if wait > 0:
+                return retry_later('Rate limit exceeded', wait)
+            
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
 # ============================================================================
 # AUTHENTICATION ROUTES
 # ============================================================================
@@ -74,7 +191,7 @@ def signup():
             return jsonify({'error': 'Missing required fields'}), 400
         
         # Hash password
-        hashed_password = generate_password_hash(data['password'])
+        hashed_password = password_hasher.hash(data['password'])
         
         # Create user
         user_id = db.create_user(
@@ -86,6 +203,8 @@ def signup():
         if not user_id:
             return jsonify({'error': 'Email already exists'}), 409
         
+        user_cache.invalidate(email=data['email'])
+        
         # Create JWT token - CONVERT TO STRING
         access_token = create_access_token(identity=str(user_id))
         
@@ -99,6 +218,8 @@ def signup():
             }
         }), 201
         
+    except HasherBusy as e:
+        return retry_later(str(e), 1, status=503)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -114,15 +235,22 @@ def login():
             return jsonify({'error': 'Missing email or password'}), 400
         
         # Get user
-        user = db.get_user_by_email(data['email'])
+        user = user_cache.get_user_by_email(data['email'])
         
         if not user:
             return jsonify({'error': 'Invalid credentials'}), 401
         
         # Check password
-        if not check_password_hash(user['password'], data['password']):
+        if not password_hasher.check(user['password'], data['password']):
             return jsonify({'error': 'Invalid credentials'}), 401
         
+        # Upgrade hashes made with older parameters (off the request path)
+        if password_hasher.needs_rehash(user['password']):
+            def store_rehash(new_hash, user=user):
+                db.update_user_password(user['id'], new_hash)
+                user_cache.invalidate(email=user['email'])
+            password_hasher.rehash_in_background(data['password'], store_rehash)
+        
         # Create JWT token - CONVERT TO STRING
         access_token = create_access_token(identity=str(user['id']))
         
@@ -136,6 +264,8 @@ def login():
             }
         }), 200
         
+    except HasherBusy as e:
+        return retry_later(str(e), 1, status=503)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -146,6 +276,7 @@ def login():
 
 @app.route('/api/tickets/create', methods=['POST'])
 @jwt_required()
+@rate_limited('create')
 def create_ticket():
     """Create a new ticket with AI prediction"""
     try:
@@ -158,11 +289,20 @@ def create_ticket():
         
         # Use AI to predict category and priority
         print(f"\n🤖 Predicting for: {data['description'][:50]}...")
-        prediction = predictor.predict(data['description'])
+        prediction = run_inference(data['description'], return_embedding=True,
+                                   finish_encoder=FULL_DEPTH_ON_CREATE)
         
         if not prediction['success']:
             return jsonify({'error': 'AI prediction failed', 'details': prediction.get('error')}), 500
         
+        embedding = prediction.pop('embedding')
+        
+        # Look for open tickets of this user that it duplicates (before it joins the store)
+        duplicates = []
+        if DUPLICATE_THRESHOLD and embedding is not None:
+            duplicates = find_similar_tickets(embedding, min_score=DUPLICATE_THRESHOLD, open_only=True,
+                                              user_id=user_id)
+        
         # Create ticket in database
         ticket = db.create_ticket(
             user_id=user_id,
@@ -172,6 +312,16 @@ def create_ticket():
             priority=prediction['priority']
         )
         
+        if embedding is not None:
+            embedding_store.add(ticket['id'], embedding)
+        
+        for duplicate in duplicates:
+            db.add_ticket_history(
+                ticket['id'],
+                f"Possible duplicate of {duplicate['ticket_number']} ({duplicate['similarity']:.0%} similar)",
+                user_id
+            )
+        
         # Get full ticket details
         ticket_details = db.get_ticket_by_id(ticket['id'])
         
@@ -180,8 +330,10 @@ def create_ticket():
             'ticket': ticket_details,
             'ai_prediction': {
                 'department': prediction['department'],
-                'priority': prediction['priority']
-            }
+                'priority': prediction['priority'],
+                'model_version': prediction['model_version']
+            },
+            'possible_duplicates': duplicates
         }), 201
         
     except Exception as e:
@@ -189,6 +341,43 @@ def create_ticket():
         return jsonify({'error': str(e)}), 500
 
 
+def find_similar_tickets(embedding, k=5, exclude_ids=(), min_score=0.0, open_only=False, user_id=None):
+    """
+    Nearest stored tickets to an embedding, as small summary dicts
+    With user_id only that user's own tickets are compared, so customers
+    never see other users' tickets; without it (admin) the whole store is.
+    """
+    among = None
+    if user_id is not None:
+        among = [ticket['id'] for ticket in db.get_tickets_by_user(user_id)]
+        if not among:
+            return []
+    
+    # Over-fetch when filtering so closed or deleted tickets don't leave gaps
+    matches = embedding_store.search(embedding, k=k * 4 if open_only else k,
+                                     exclude_ids=exclude_ids, among=among)
+    
+    similar = []
+    for ticket_id, score in matches:
+        if score < min_score or len(similar) == k:
+            break
+        ticket = db.get_ticket_by_id(ticket_id)
+        if not ticket or (open_only and ticket['status'] == 'Closed'):
+            continue
+        if user_id is not None and ticket['user_id'] != user_id:
+            continue
+        similar.append({
+            'id': ticket['id'],
+            'ticket_number': ticket['ticket_number'],
+            'title': ticket['title'],
+            'category': ticket['category'],
+            'status': ticket['status'],
+            'similarity': round(score, 4)
+        })
+    
+    return similar
+
+
 @app.route('/api/tickets', methods=['GET'])
 @jwt_required()
 def get_tickets():
@@ -198,9 +387,20 @@ def get_tickets():
         
         # Get status filter if provided
         status = request.args.get('status', None)
+        include_archived = request.args.get('include_archived', 'false').lower() == 'true'
+        
+        # Get tickets (archive is only read when asked for, one page at a time)
+        archive_page = max(request.args.get('archive_page', 1, type=int), 1)
+        page_size = min(max(request.args.get('page_size', 20, type=int), 1), 100)
+        tickets = archive.get_tickets_by_user(
+            user_id, status, include_archived,
+            archive_limit=page_size, archive_offset=(archive_page - 1) * page_size
+        )
         
-        # Get tickets
-        tickets = db.get_tickets_by_user(user_id, status)
+        # ?format=compact sends column names once and each ticket as an array
+        if request.args.get('format') == 'compact':
+            columns = TICKET_COLUMNS + (['archived'] if include_archived else [])
+            return jsonify({**compact_rows(tickets, columns), 'count': len(tickets)}), 200
         
         return jsonify({
             'tickets': tickets,
@@ -216,7 +416,7 @@ def get_tickets():
 def get_ticket(ticket_id):
     """Get a single ticket by ID"""
     try:
-        ticket = db.get_ticket_by_id(ticket_id)
+        ticket = archive.get_ticket_by_id(ticket_id)
         
         if not ticket:
             return jsonify({'error': 'Ticket not found'}), 404
@@ -227,6 +427,62 @@ def get_ticket(ticket_id):
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/tickets/<int:ticket_id>/similar', methods=['GET'])
+@jwt_required()
+def get_similar_tickets(ticket_id):
+    """Get the logged-in user's tickets most similar to one of their tickets"""
+    try:
+        user_id = int(get_jwt_identity())
+        k = min(max(request.args.get('k', 5, type=int), 1), 50)
+        open_only = request.args.get('open_only', 'false').lower() == 'true'
+        
+        ticket = archive.get_ticket_by_id(ticket_id)
+        if not ticket or ticket['user_id'] != user_id:
+            return jsonify({'error': 'Ticket not found'}), 404
+        
+        embedding = embedding_store.get(ticket_id)
+        if embedding is None:
+            return jsonify({'error': 'No embedding stored for this ticket'}), 404
+        
+        similar = find_similar_tickets(embedding, k=k, exclude_ids=[ticket_id], open_only=open_only,
+                                       user_id=user_id)
+        
+        return jsonify({
+            'similar': similar,
+            'count': len(similar)
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/tickets/archive', methods=['GET'])
+@jwt_required()
+def get_archived_tickets():
+    """Get one page of archived (old closed) tickets for logged-in user"""
+    try:
+        user_id = int(get_jwt_identity())
+        page = max(request.args.get('page', 1, type=int), 1)
+        page_size = min(max(request.args.get('page_size', 20, type=int), 1), 100)
+        
+        # Fetch one extra row to know whether another page exists
+        tickets = archive.get_archived_tickets_by_user(
+            user_id, limit=page_size + 1, offset=(page - 1) * page_size
+        )
+        has_more = len(tickets) > page_size
+        tickets = tickets[:page_size]
+        
+        return jsonify({
+            'tickets': tickets,
+            'count': len(tickets),
+            'page': page,
+            'has_more': has_more
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @app.route('/api/tickets/<int:ticket_id>/status', methods=['PUT'])
 @jwt_required()
 def update_ticket_status(ticket_id):
@@ -308,6 +564,7 @@ def get_activities():
 
 @app.route('/api/ai/predict', methods=['POST'])
 @jwt_required()
+@rate_limited('preview', shed_when_overloaded=True)
 def predict():
     """Test AI prediction without creating ticket"""
     try:
@@ -317,7 +574,7 @@ def predict():
             return jsonify({'error': 'Missing text'}), 400
         
         # Predict
-        prediction = predictor.predict(data['text'])
+        prediction = run_inference(data['text'])
         
         return jsonify({
             'prediction': prediction
@@ -365,41 +622,94 @@ def is_admin_request():
     return auth_header == 'Bearer admin_token'
 
 
+# Rows are pulled from SQLite this many at a time while streaming
+STREAM_CHUNK_SIZE = 500
+
+
+def iter_rows(cursor, columns, label):
+    """
+    Yield result rows as dicts, fetchmany() chunk by chunk, so only one
+    chunk is ever held in memory. Closes the connection when done.
+    """
+    count = 0
+    try:
+        while True:
+            rows = cursor.fetchmany(STREAM_CHUNK_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                count += 1
+                yield {column: row[column] for column in columns}
+    finally:
+        cursor.connection.close()
+        print(f"✅ Admin streamed {count} {label}")
+
+
+def stream_json_list(key, rows, head=None):
+    """Encode rows as {<head members>, "<key>": [...]} one chunk at a time"""
+    members = ''.join('"%s": %s, ' % (name, dumps(value)) for name, value in (head or {}).items())
+    yield '{%s"%s": [' % (members, key)
+    separator = ''
+    chunk = []
+    for row in rows:
+        chunk.append(dumps(row))
+        if len(chunk) >= STREAM_CHUNK_SIZE:
+            yield separator + ','.join(chunk)
+            separator = ','
+            chunk = []
+    if chunk:
+        yield separator + ','.join(chunk)
+    yield ']}'
+
+
+def stream_ndjson(rows):
+    """Encode rows as newline-delimited JSON"""
+    chunk = []
+    for row in rows:
+        chunk.append(dumps(row))
+        if len(chunk) >= STREAM_CHUNK_SIZE:
+            yield '\n'.join(chunk) + '\n'
+            chunk = []
+    if chunk:
+        yield '\n'.join(chunk) + '\n'
+
+
+def stream_csv(columns, rows):
+    """Encode rows as CSV with a header line"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns)
+    writer.writeheader()
+    for i, row in enumerate(rows, start=1):
+        writer.writerow(row)
+        if i % STREAM_CHUNK_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+    yield buffer.getvalue()
+
+
+def open_admin_cursor(query):
+    """Run an admin listing query and return the open cursor"""
+    conn = db.get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(query)
+        return cursor
+    except Exception:
+        conn.close()
+        raise
+
+
 @app.route('/api/admin/users', methods=['GET'])
 def admin_get_users():
-    """Get all users with their ticket counts"""
+    """Get all users with their ticket counts (streamed)"""
     if not is_admin_request():
         return jsonify({'error': 'Unauthorized'}), 401
     
     try:
-        # ✅ FIXED: Use correct database path
-        db_path = os.path.join(os.path.dirname(__file__), 'database', 'ticket_system.db')
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        # Get all users with ticket count
-        cursor.execute('''
-            SELECT u.*, COUNT(t.id) as ticket_count
-            FROM users u
-            LEFT JOIN tickets t ON u.id = t.user_id
-            GROUP BY u.id
-            ORDER BY u.created_at DESC
-        ''')
-        
-        users = []
-        for row in cursor.fetchall():
-            users.append({
-                'id': row['id'],
-                'name': row['name'],
-                'email': row['email'],
-                'created_at': row['created_at'],
-                'ticket_count': row['ticket_count']
-            })
-        
-        conn.close()
-        print(f"✅ Admin fetched {len(users)} users")
-        return jsonify({'users': users}), 200
+        cursor = open_admin_cursor(ADMIN_USERS_QUERY)
+        rows = iter_rows(cursor, ADMIN_USER_COLUMNS, 'users')
+        return Response(stream_json_list('users', rows), mimetype='application/json')
         
     except Exception as e:
         print(f"❌ Error fetching users: {e}")
@@ -408,51 +718,55 @@ def admin_get_users():
 
 @app.route('/api/admin/tickets', methods=['GET'])
 def admin_get_tickets():
-    """Get all tickets from all users"""
+    """Get all tickets from all users (streamed, ?format=compact for row arrays)"""
     if not is_admin_request():
         return jsonify({'error': 'Unauthorized'}), 401
     
     try:
-        # ✅ FIXED: Use correct database path
-        db_path = os.path.join(os.path.dirname(__file__), 'database', 'ticket_system.db')
-        conn = sqlite3.connect(db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
+        cursor = open_admin_cursor(ADMIN_TICKETS_QUERY)
+        rows = iter_rows(cursor, ADMIN_TICKET_COLUMNS, 'tickets')
         
-        # Get all tickets with user info
-        cursor.execute('''
-            SELECT t.*, u.name as user_name, u.email as user_email
-            FROM tickets t
-            LEFT JOIN users u ON t.user_id = u.id
-            ORDER BY t.created_at DESC
-        ''')
-        
-        tickets = []
-        for row in cursor.fetchall():
-            tickets.append({
-                'id': row['id'],
-                'ticket_number': row['ticket_number'],
-                'title': row['title'],
-                'description': row['description'],
-                'category': row['category'],
-                'priority': row['priority'],
-                'status': row['status'],
-                'user_id': row['user_id'],
-                'user_name': row['user_name'],
-                'user_email': row['user_email'],
-                'created_at': row['created_at'],
-                'updated_at': row['updated_at']
-            })
+        if request.args.get('format') == 'compact':
+            arrays = ([row[column] for column in ADMIN_TICKET_COLUMNS] for row in rows)
+            body = stream_json_list('rows', arrays, head={'columns': ADMIN_TICKET_COLUMNS})
+        else:
+            body = stream_json_list('tickets', rows)
         
-        conn.close()
-        print(f"✅ Admin fetched {len(tickets)} tickets")
-        return jsonify({'tickets': tickets}), 200
+        return Response(body, mimetype='application/json')
         
     except Exception as e:
         print(f"❌ Error fetching tickets: {e}")
         return jsonify({'error': str(e)}), 500
 
 
+@app.route('/api/admin/tickets/export', methods=['GET'])
+def admin_export_tickets():
+    """Export all tickets as CSV (default) or NDJSON (?format=ndjson)"""
+    if not is_admin_request():
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    export_format = request.args.get('format', 'csv').lower()
+    if export_format not in ('csv', 'ndjson'):
+        return jsonify({'error': 'Invalid format. Must be one of: csv, ndjson'}), 400
+    
+    try:
+        cursor = open_admin_cursor(ADMIN_TICKETS_QUERY)
+        rows = iter_rows(cursor, ADMIN_TICKET_COLUMNS, 'tickets for export')
+        
+        if export_format == 'ndjson':
+            body, mimetype = stream_ndjson(rows), 'application/x-ndjson'
+        else:
+            body, mimetype = stream_csv(ADMIN_TICKET_COLUMNS, rows), 'text/csv'
+        
+        return Response(body, mimetype=mimetype, headers={
+            'Content-Disposition': f'attachment; filename=tickets.{export_format}'
+        })
+        
+    except Exception as e:
+        print(f"❌ Error exporting tickets: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
 @app.route('/api/admin/tickets/<int:ticket_id>', methods=['PUT'])
 def admin_update_ticket(ticket_id):
     """Update ticket department, priority, or status"""
@@ -465,19 +779,7 @@ def admin_update_ticket(ticket_id):
         priority = data.get('priority')
         status = data.get('status')
         
-        # ✅ FIXED: Use correct database path
-        db_path = os.path.join(os.path.dirname(__file__), 'database', 'ticket_system.db')
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            UPDATE tickets 
-            SET category = ?, priority = ?, status = ?, updated_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-        ''', (category, priority, status, ticket_id))
-        
-        conn.commit()
-        conn.close()
+        db.admin_update_ticket(ticket_id, category, priority, status)
         
         print(f"✅ Admin updated ticket #{ticket_id}")
         return jsonify({
@@ -497,16 +799,7 @@ def admin_delete_ticket(ticket_id):
         return jsonify({'error': 'Unauthorized'}), 401
     
     try:
-        # ✅ FIXED: Use correct database path
-        db_path = os.path.join(os.path.dirname(__file__), 'database', 'ticket_system.db')
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        # Delete ticket
-        cursor.execute('DELETE FROM tickets WHERE id = ?', (ticket_id,))
-        
-        conn.commit()
-        conn.close()
+        db.delete_ticket(ticket_id)
         
         print(f"✅ Admin deleted ticket #{ticket_id}")
         return jsonify({'message': 'Ticket deleted successfully'}), 200
@@ -516,26 +809,148 @@ def admin_delete_ticket(ticket_id):
         return jsonify({'error': str(e)}), 500
 
 
-@app.route('/api/admin/users/<int:user_id>', methods=['DELETE'])
-def admin_delete_user(user_id):
-    """Delete a user and all their tickets"""
+@app.route('/api/admin/tickets/<int:ticket_id>/similar', methods=['GET'])
+def admin_similar_tickets(ticket_id):
+    """Get the tickets most similar to a ticket, across all users"""
     if not is_admin_request():
         return jsonify({'error': 'Unauthorized'}), 401
     
     try:
-        # ✅ FIXED: Use correct database path
-        db_path = os.path.join(os.path.dirname(__file__), 'database', 'ticket_system.db')
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
+        k = min(max(request.args.get('k', 5, type=int), 1), 50)
+        open_only = request.args.get('open_only', 'false').lower() == 'true'
         
-        # Delete user's tickets first
-        cursor.execute('DELETE FROM tickets WHERE user_id = ?', (user_id,))
+        embedding = embedding_store.get(ticket_id)
+        if embedding is None:
+            return jsonify({'error': 'No embedding stored for this ticket'}), 404
         
-        # Delete user
-        cursor.execute('DELETE FROM users WHERE id = ?', (user_id,))
+        similar = find_similar_tickets(embedding, k=k, exclude_ids=[ticket_id], open_only=open_only)
         
-        conn.commit()
-        conn.close()
+        return jsonify({
+            'similar': similar,
+            'count': len(similar)
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/admin/queue/claim', methods=['POST'])
+def admin_claim_ticket():
+    """Claim the most urgent, oldest open ticket of a department for an agent"""
+    if not is_admin_request():
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    try:
+        data = request.get_json() or {}
+        category = data.get('category')
+        
+        if not category:
+            return jsonify({'error': 'category is required'}), 400
+        
+        ticket = db.claim_next_ticket(category, int(data.get('agent_id') or 0))
+        if ticket is None:
+            return jsonify({'message': f'No open tickets in {category}', 'ticket': None}), 200
+        
+        print(f"✅ Claimed {ticket['ticket_number']} from the {category} queue")
+        return jsonify({'message': 'Ticket claimed', 'ticket': ticket}), 200
+        
+    except Exception as e:
+        print(f"❌ Error claiming ticket: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/admin/models', methods=['GET'])
+def admin_get_models():
+    """List classifier versions and the one serving in this worker"""
+    if not is_admin_request():
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    versions = predictor.registry.list_versions()
+    return jsonify({
+        'versions': versions,
+        'encoders': {version: predictor.registry.encoder_info(version) for version in versions},
+        'current': predictor.registry.current_version(),
+        'serving': predictor.model_version,
+        'encoder_layers': predictor.encoder_depth()
+    }), 200
+
+
+@app.route('/api/admin/models/activate', methods=['POST'])
+def admin_activate_model():
+    """Warm up and switch to a classifier version without restarting"""
+    if not is_admin_request():
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    try:
+        data = request.get_json() or {}
+        version = data.get('version')
+        
+        if version not in predictor.registry.list_versions():
+            return jsonify({'error': f'Unknown model version: {version}'}), 400
+        
+        # Load and warm up here first, so a broken version is never activated
+        serving = predictor.reload_models(version)
+        predictor.registry.set_current(version)
+        
+        print(f"✅ Admin activated model version {serving}")
+        return jsonify({
+            'message': 'Model version activated',
+            'serving': serving
+        }), 200
+        
+    except Exception as e:
+        print(f"❌ Error activating model: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/admin/metrics/auth', methods=['GET'])
+def admin_auth_metrics():
+    """Password hashing queue and user cache counters for this worker"""
+    if not is_admin_request():
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    return jsonify({
+        'hasher': password_hasher.stats(),
+        'user_cache': user_cache.stats()
+    }), 200
+
+
+@app.route('/api/admin/analytics', methods=['GET'])
+def admin_analytics():
+    """
+    Tickets created/closed, time to close and open backlog over time
+    ?start=2024-01-01&end=2024-02-01&bucket=day|hour&category=&priority=&group_by=category|priority
+    """
+    if not is_admin_request():
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    try:
+        result = analytics.query(
+            start=request.args.get('start'),
+            end=request.args.get('end'),
+            bucket=request.args.get('bucket', 'day'),
+            category=request.args.get('category'),
+            priority=request.args.get('priority'),
+            group_by=request.args.get('group_by')
+        )
+        return jsonify(result), 200
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"❌ Error querying analytics: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/admin/users/<int:user_id>', methods=['DELETE'])
+def admin_delete_user(user_id):
+    """Delete a user and all their tickets"""
+    if not is_admin_request():
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    try:
+        db.delete_user(user_id)
+        user_cache.invalidate(user_id=user_id)
         
         print(f"✅ Admin deleted user #{user_id}")
         return jsonify({'message': 'User deleted successfully'}), 200
@@ -560,9 +975,7 @@ if __name__ == '__main__':
     
     # For local development
     app.run(debug=True, port=5000)
-else:
-    # For production (Render, Heroku, etc.)
-    import os
-    port = int(os.environ.get('PORT', 5000))
-    # App runs via gunicorn in production
-    app.run(host="0.0.0.0", port=port, debug=True)
\ No newline at end of file
+
+# In production the app is imported, not run:
+#   sync:  gunicorn app:app
+#   async: uvicorn asgi:application   (see asgi.py)
\ No newline at end of file
@@ -0,0 +1,279 @@
+from datetime import datetime
+import argparse
+import sqlite3
+import zlib
+import os
+
+from models import Database, TICKET_COLUMNS
+
+
+def compress_text(text):
+    """Compress a description for cold storage"""
+    if text is None:
+        return None
+    return zlib.compress(text.encode('utf-8'), 9)
+
+
+def decompress_text(blob):
+    """Restore a description stored by compress_text"""
+    if blob is None:
+        return None
+    return zlib.decompress(blob).decode('utf-8')
+
+
+class TicketArchive:
+    """
+    Cold storage for old closed tickets and their history
+    Lives in a separate SQLite file so the hot tables stay small
+    """
+
+    def __init__(self, db, archive_path='database/ticket_archive.db'):
+        """Initialize archive database next to the main one"""
+        self.db = db
+
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        self.archive_path = os.path.join(base_dir, archive_path)
+
+        os.makedirs(os.path.dirname(self.archive_path), exist_ok=True)
+
+        self.create_tables()
+
+    def get_connection(self):
+        """Get archive database connection"""
+        conn = sqlite3.connect(self.archive_path)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def create_tables(self):
+        """Create archive tables (descriptions are stored compressed)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS tickets (
+                id INTEGER PRIMARY KEY,
+                ticket_number TEXT UNIQUE NOT NULL,
+                user_id INTEGER NOT NULL,
+                title TEXT NOT NULL,
+                description BLOB NOT NULL,
+                category TEXT NOT NULL,
+                priority TEXT NOT NULL,
+                status TEXT NOT NULL,
+                created_at TIMESTAMP,
+                updated_at TIMESTAMP,
+                archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_archive_tickets_user
+            ON tickets (user_id, updated_at DESC)
+        ''')
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS ticket_history (
+                id INTEGER PRIMARY KEY,
+                ticket_id INTEGER NOT NULL,
+                action TEXT NOT NULL,
+                changed_by INTEGER NOT NULL,
+                timestamp TIMESTAMP
+            )
+        ''')
+
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_archive_history_ticket
+            ON ticket_history (ticket_id)
+        ''')
+
+        conn.commit()
+        conn.close()
+
+    # ARCHIVAL JOB
+
+    def archive_closed_tickets(self, older_than_days=180, batch_size=500):
+        """
+        Move closed tickets not updated for `older_than_days` (and their
+        history) into the archive. Activities stay in the hot table, where
+        the activity endpoint reads them.
+
+        With the main file in WAL mode SQLite only commits atomically per
+        file, so each batch is two write transactions: copy into the
+        archive, then delete from the hot tables only what the archive now
+        holds unchanged. A crash in between leaves the tickets in both
+        files, and the next run copies them again (INSERT OR REPLACE)
+        before deleting them. Tickets reopened or changed in between stay
+        hot; the run ends by dropping archive copies of every hot ticket.
+
+        Returns:
+            dict: number of tickets and history rows moved
+        """
+        cutoff = f'-{int(older_than_days)} days'
+        moved = {'tickets': 0, 'history': 0}
+        attach = {'archive': self.archive_path}
+
+        columns = ', '.join(TICKET_COLUMNS)
+        selected = ', '.join(
+            'compress_text(description)' if c == 'description' else c
+            for c in TICKET_COLUMNS
+        )
+
+        while True:
+            # 1. Copy (selected under the write lock, so only tickets closed right now)
+            with self.db.write_transaction(attach=attach) as cursor:
+                cursor.connection.create_function('compress_text', 1, compress_text)
+
+                cursor.execute('''
+                    SELECT id FROM main.tickets
+                    WHERE status = 'Closed' AND updated_at < datetime('now', ?)
+                    LIMIT ?
+                ''', (cutoff, batch_size))
+                ids = [row['id'] for row in cursor.fetchall()]
+
+                if not ids:
+                    break
+
+                placeholders = ','.join('?' * len(ids))
+
+                cursor.execute(f'''
+                    INSERT OR REPLACE INTO archive.tickets ({columns})
+                    SELECT {selected} FROM main.tickets WHERE id IN ({placeholders})
+                ''', ids)
+
+                cursor.execute(f'''
+                    INSERT OR REPLACE INTO archive.ticket_history
+                    SELECT id, ticket_id, action, changed_by, timestamp
+                    FROM main.ticket_history WHERE ticket_id IN ({placeholders})
+                ''', ids)
+
+            # 2. Delete what the archive holds unchanged
+            with self.db.write_transaction(attach=attach) as cursor:
+                cursor.execute(f'''
+                    DELETE FROM main.tickets
+                    WHERE id IN ({placeholders})
+                      AND status = 'Closed' AND updated_at < datetime('now', ?)
+                      AND EXISTS (
+                          SELECT 1 FROM archive.tickets a
+                          WHERE a.id = tickets.id AND a.status = tickets.status
+                            AND a.updated_at = tickets.updated_at
+                            AND a.category = tickets.category AND a.priority = tickets.priority
+                      )
+                ''', ids + [cutoff])
+                moved['tickets'] += cursor.rowcount
+
+                # History rows written after the copy stay hot rather than get lost
+                cursor.execute(f'''
+                    DELETE FROM main.ticket_history
+                    WHERE ticket_id IN ({placeholders})
+                      AND ticket_id NOT IN (SELECT id FROM main.tickets)
+                      AND id IN (SELECT id FROM archive.ticket_history)
+                ''', ids)
+                moved['history'] += cursor.rowcount
+
+        # 3. Stale copies: tickets changed between the steps, or left by an interrupted run
+        with self.db.write_transaction(attach=attach) as cursor:
+            stale = 'SELECT t.id FROM main.tickets t JOIN archive.tickets a ON a.id = t.id'
+            cursor.execute(f'DELETE FROM archive.ticket_history WHERE ticket_id IN ({stale})')
+            cursor.execute(f'DELETE FROM archive.tickets WHERE id IN ({stale})')
+
+        return moved
+
+    def compact(self):
+        """Reclaim space freed by archiving in both database files"""
+        for path in (self.db.db_path, self.archive_path):
+            conn = sqlite3.connect(path)
+            conn.execute('VACUUM')
+            conn.close()
+
+    # ARCHIVE QUERIES
+
+    def _ticket_from_row(self, row):
+        """Turn an archive row into the same dict shape as a hot ticket"""
+        ticket = dict(row)
+        ticket['description'] = decompress_text(ticket['description'])
+        ticket['archived'] = True
+        return ticket
+
+    def get_archived_tickets_by_user(self, user_id, limit=20, offset=0):
+        """Get one page of archived tickets for a user, newest first"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT * FROM tickets
+            WHERE user_id = ?
+            ORDER BY updated_at DESC
+            LIMIT ? OFFSET ?
+        ''', (user_id, limit, offset))
+
+        tickets = cursor.fetchall()
+        conn.close()
+
+        return [self._ticket_from_row(ticket) for ticket in tickets]
+
+    def get_archived_ticket_by_id(self, ticket_id):
+        """Get a single archived ticket by ID"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT * FROM tickets WHERE id = ?', (ticket_id,))
+        ticket = cursor.fetchone()
+        conn.close()
+        return self._ticket_from_row(ticket) if ticket else None
+
+    def get_archived_history(self, ticket_id):
+        """Get the archived history rows of a ticket"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT * FROM ticket_history
+            WHERE ticket_id = ?
+            ORDER BY timestamp
+        ''', (ticket_id,))
+        history = cursor.fetchall()
+        conn.close()
+        return [dict(row) for row in history]
+
+    # UNIFIED QUERIES (hot tables first, archive only when asked)
+
+    def get_tickets_by_user(self, user_id, status=None, include_archived=False,
+                            archive_limit=20, archive_offset=0):
+        """
+        Same as Database.get_tickets_by_user, optionally followed by one page
+        of archived tickets (see get_archived_tickets_by_user)
+        """
+        tickets = self.db.get_tickets_by_user(user_id, status)
+
+        if include_archived and status in (None, 'Closed'):
+            tickets += self.get_archived_tickets_by_user(user_id, archive_limit, archive_offset)
+
+        return tickets
+
+    def get_ticket_by_id(self, ticket_id):
+        """Look up a ticket in the hot table, falling back to the archive"""
+        ticket = self.db.get_ticket_by_id(ticket_id)
+        if ticket:
+            return ticket
+        return self.get_archived_ticket_by_id(ticket_id)
+
+
+# Run the archival job from the command line
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Archive old closed tickets')
+    parser.add_argument('--days', type=int,
+                        default=int(os.environ.get('ARCHIVE_AFTER_DAYS', 180)),
+                        help='Archive closed tickets not updated for this many days')
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--compact', action='store_true',
+                        help='VACUUM both database files afterwards')
+    args = parser.parse_args()
+
+    print(f"\n🗄️  Archiving closed tickets older than {args.days} days...\n")
+
+    archive = TicketArchive(Database())
+    started = datetime.now()
+    moved = archive.archive_closed_tickets(args.days, args.batch_size)
+
+    print(f"✅ Moved {moved['tickets']} ticket(s) and {moved['history']} history row(s) "
+          f"in {(datetime.now() - started).total_seconds():.1f}s")
+
+    if args.compact:
+        archive.compact()
+        print("✅ Database files compacted")
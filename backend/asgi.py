@@ -0,0 +1,138 @@
+"""
+ASGI serving mode
+
+    cd backend && uvicorn asgi:application --host 0.0.0.0 --port $PORT
+
+Serves the same Flask routes and JWT handling as `gunicorn app:app`. The
+event loop holds idle and waiting connections, and each request body runs
+in a bounded thread pool (REQUEST_THREADS). That covers SQLite calls and
+waiting on the inference pool (INFERENCE_THREADS in app.py). A slow BERT
+call or a lock wait therefore ties up one thread instead of a whole
+worker process.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import sys
+import io
+import os
+
+from app import app, inference_executor, audit_buffer
+
+
+REQUEST_THREADS = int(os.environ.get('REQUEST_THREADS', 64))
+
+request_executor = ThreadPoolExecutor(max_workers=REQUEST_THREADS, thread_name_prefix='request')
+
+
+def build_environ(scope, body):
+    """Translate an ASGI HTTP scope into a WSGI environ"""
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf8').decode('latin1'),
+        'PATH_INFO': scope['path'].encode('utf8').decode('latin1'),
+        'QUERY_STRING': scope['query_string'].decode('latin1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope['http_version']}",
+        'REMOTE_ADDR': client[0],
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+
+    for name, value in scope['headers']:
+        name = name.decode('latin1').upper().replace('-', '_')
+        value = value.decode('latin1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name != 'CONTENT_LENGTH':
+            key = f'HTTP_{name}'
+            environ[key] = f'{environ[key]},{value}' if key in environ else value
+
+    return environ
+
+
+def run_wsgi(environ, send_from_thread):
+    """Call the Flask app on a request thread, streaming its body back"""
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response['status'] = int(status.split(' ', 1)[0])
+        response['headers'] = [
+            (name.lower().encode('latin1'), value.encode('latin1')) for name, value in headers
+        ]
+
+    body = app(environ, start_response)
+    try:
+        started = False
+        for chunk in body:
+            if not chunk:
+                continue
+            if not started:
+                send_from_thread({'type': 'http.response.start', 'status': response['status'],
+                                  'headers': response['headers']})
+                started = True
+            send_from_thread({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+
+        if not started:
+            send_from_thread({'type': 'http.response.start', 'status': response['status'],
+                              'headers': response['headers']})
+        send_from_thread({'type': 'http.response.body', 'body': b''})
+    finally:
+        if hasattr(body, 'close'):
+            body.close()
+
+
+async def http(scope, receive, send):
+    """Handle one HTTP request"""
+    body = b''
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            break
+
+    loop = asyncio.get_running_loop()
+
+    def send_from_thread(message):
+        # Waits for each send, so slow clients push back on streaming generators
+        asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+    await loop.run_in_executor(request_executor, run_wsgi, build_environ(scope, body), send_from_thread)
+
+
+async def lifespan(receive, send):
+    """Startup/shutdown events: let in-flight work finish and flush audit rows on exit"""
+    while True:
+        message = await receive()
+
+        if message['type'] == 'lifespan.startup':
+            print(f"✅ ASGI mode: {REQUEST_THREADS} request threads")
+            await send({'type': 'lifespan.startup.complete'})
+
+        elif message['type'] == 'lifespan.shutdown':
+            # Wait off the loop: request threads still streaming need it to send
+            await asyncio.to_thread(request_executor.shutdown, True)
+            await asyncio.to_thread(inference_executor.shutdown, True)
+            if audit_buffer is not None:
+                await asyncio.to_thread(audit_buffer.close)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    """ASGI entry point"""
+    if scope['type'] == 'lifespan':
+        await lifespan(receive, send)
+    elif scope['type'] == 'http':
+        await http(scope, receive, send)
@@ -0,0 +1,107 @@
+import threading
+import time
+
+
+class AuditBuffer:
+    """
+    Write-behind buffer for ticket_history and activities rows
+    Rows are queued by Database and written in batched executemany
+    transactions every `flush_interval_ms` or once `max_rows` are waiting.
+    Rows stay visible through pending_activities() until they are committed,
+    so readers in this process always see their own writes.
+    """
+
+    def __init__(self, db, flush_interval_ms=200, max_rows=500):
+        self.db = db
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_rows = max_rows
+
+        self._history = []
+        self._activities = []
+        self._in_flight_activities = []
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+        self._thread.start()
+
+    def add(self, history=(), activities=()):
+        """Queue (ticket_id, action, changed_by, timestamp) and
+        (user_id, activity_type, description, timestamp) rows"""
+        with self._condition:
+            if self._closed:
+                raise RuntimeError('Audit buffer is closed')
+            self._history.extend(history)
+            self._activities.extend(activities)
+            if len(self._history) + len(self._activities) >= self.max_rows:
+                self._condition.notify()
+
+    def pending_activities(self, user_id):
+        """Activities of a user that are not committed yet, as dicts"""
+        with self._condition:
+            rows = self._in_flight_activities + self._activities
+        return [
+            {'id': None, 'user_id': row[0], 'activity_type': row[1],
+             'description': row[2], 'timestamp': row[3]}
+            for row in rows if row[0] == user_id
+        ]
+
+    def flush(self):
+        """Write everything queued so far in one transaction"""
+        with self._flush_lock:
+            with self._condition:
+                history, self._history = self._history, []
+                activities, self._activities = self._activities, []
+                self._in_flight_activities = activities
+
+            if not history and not activities:
+                return 0
+
+            try:
+                conn = self.db.get_connection()
+                try:
+                    cursor = conn.cursor()
+                    self.db.insert_history_rows(cursor, history)
+                    self.db.insert_activity_rows(cursor, activities)
+                    conn.commit()
+                finally:
+                    conn.close()
+            except Exception:
+                # Put the rows back in front so the next flush retries them
+                with self._condition:
+                    self._history[:0] = history
+                    self._activities[:0] = activities
+                raise
+            finally:
+                with self._condition:
+                    self._in_flight_activities = []
+
+            return len(history) + len(activities)
+
+    def _run(self):
+        """Background writer loop"""
+        while True:
+            with self._condition:
+                if not self._closed and len(self._history) + len(self._activities) < self.max_rows:
+                    self._condition.wait(self.flush_interval)
+                closed = self._closed
+
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"⚠️ Audit flush failed, will retry: {e}")
+                time.sleep(self.flush_interval)
+
+            if closed:
+                return
+
+    def close(self):
+        """Stop accepting rows, write what is left and stop the writer thread"""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+        self.flush()
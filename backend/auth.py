@@ -0,0 +1,152 @@
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+import threading
+import time
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class HasherBusy(Exception):
+    """Raised when the hashing queue is full; the caller should retry later"""
+
+
+class PasswordHasher:
+    """
+    Password hashing in a dedicated, bounded thread pool
+    hashlib releases the GIL while hashing, so this runs in parallel with
+    request threads without letting a login storm take over every CPU.
+    """
+
+    def __init__(self, method='scrypt:32768:8:1', threads=2, max_queue=64):
+        self.method = method
+        # werkzeug expands short names ('scrypt' -> 'scrypt:32768:8:1'), so
+        # compare stored hashes with the prefix it actually writes
+        self._prefix = generate_password_hash('', method).split('$', 1)[0]
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='hasher')
+        self._lock = threading.Lock()
+        self._stats = {
+            'queued': 0,
+            'completed': 0,
+            'rejected': 0,
+            'rehashed': 0,
+            'wait_seconds': 0.0,
+            'hash_seconds': 0.0,
+        }
+
+    def _submit(self, func, *args):
+        """Queue work on the pool, refusing it when the queue is full"""
+        with self._lock:
+            if self._stats['queued'] >= self.max_queue:
+                self._stats['rejected'] += 1
+                raise HasherBusy('Too many authentication requests in progress')
+            self._stats['queued'] += 1
+
+        submitted = time.perf_counter()
+
+        def timed():
+            started = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                finished = time.perf_counter()
+                with self._lock:
+                    self._stats['queued'] -= 1
+                    self._stats['completed'] += 1
+                    self._stats['wait_seconds'] += started - submitted
+                    self._stats['hash_seconds'] += finished - started
+
+        return self._executor.submit(timed)
+
+    def hash(self, password):
+        """Hash a password with the configured method"""
+        return self._submit(generate_password_hash, password, self.method).result()
+
+    def check(self, password_hash, password):
+        """Check a password against its stored hash"""
+        return self._submit(check_password_hash, password_hash, password).result()
+
+    def needs_rehash(self, password_hash):
+        """True when a hash was made with other parameters than the current ones"""
+        return password_hash.split('$', 1)[0] != self._prefix
+
+    def rehash_in_background(self, password, on_done):
+        """Hash again with current parameters and pass the result to on_done"""
+        def rehash():
+            on_done(generate_password_hash(password, self.method))
+            with self._lock:
+                self._stats['rehashed'] += 1
+
+        try:
+            self._submit(rehash)
+        except HasherBusy:
+            # Not urgent: the next login will try again
+            pass
+
+    def stats(self):
+        """Queue depth and timing counters"""
+        with self._lock:
+            stats = dict(self._stats)
+
+        completed = stats['completed'] or 1
+        return {
+            'method': self.method,
+            'queue_depth': stats['queued'],
+            'max_queue': self.max_queue,
+            'completed': stats['completed'],
+            'rejected': stats['rejected'],
+            'rehashed': stats['rehashed'],
+            'avg_wait_ms': round(stats['wait_seconds'] / completed * 1000, 2),
+            'avg_hash_ms': round(stats['hash_seconds'] / completed * 1000, 2),
+        }
+
+
+class UserCache:
+    """
+    Small TTL + LRU cache in front of Database.get_user_by_email
+    Entries expire after `ttl` seconds, which bounds how long other workers
+    can see a stale row after a password change or deletion.
+    """
+
+    def __init__(self, db, ttl=60, max_size=10000):
+        self.db = db
+        self.ttl = ttl
+        self.max_size = max_size
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_user_by_email(self, email):
+        """Cached Database.get_user_by_email (misses are not cached)"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._users.get(email)
+            if entry and entry[0] > now:
+                self._users.move_to_end(email)
+                self.hits += 1
+                return dict(entry[1])
+            self.misses += 1
+
+        user = self.db.get_user_by_email(email)
+        if user:
+            with self._lock:
+                self._users[email] = (now + self.ttl, user)
+                self._users.move_to_end(email)
+                while len(self._users) > self.max_size:
+                    self._users.popitem(last=False)
+            return dict(user)
+        return None
+
+    def invalidate(self, email=None, user_id=None):
+        """Drop a user from the cache by email or id"""
+        with self._lock:
+            if email is not None:
+                self._users.pop(email, None)
+            if user_id is not None:
+                for key in [k for k, (_, user) in self._users.items() if user['id'] == user_id]:
+                    del self._users[key]
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._users), 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,210 @@
+"""
+Database scale benchmark: latency of every Database method and admin query
+as the tables grow
+
+    python benchmark.py                                   # 10k, 1M, 10M tickets
+    python benchmark.py --sizes 10000 100000 --repeat 50 --output bench.json
+
+For each size the benchmark database is topped up with generate_data.py,
+then every operation is timed. Query plans are checked for full table
+scans and temp B-trees, which are the usual reasons a query degrades as
+the data grows.
+"""
+import statistics
+import argparse
+import sqlite3
+import random
+import json
+import time
+
+from models import Database, ADMIN_USERS_QUERY, ADMIN_TICKETS_QUERY
+from generate_data import generate, parse_distribution, DEFAULT_CATEGORY
+
+
+class TracingDatabase(Database):
+    """Database that records every SQL statement it runs"""
+
+    statements = None
+
+    def get_connection(self):
+        conn = super().get_connection()
+        if self.statements is not None:
+            conn.set_trace_callback(self.statements.append)
+        return conn
+
+
+def fetch_all(db, query, chunk_size=500):
+    """Run an admin listing the way app.py streams it"""
+    conn = db.get_connection()
+    cursor = conn.cursor()
+    cursor.execute(query)
+    count = 0
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        count += len(rows)
+    conn.close()
+    return count
+
+
+def build_operations(db, rng, max_user, max_ticket):
+    """(name, callable, full_scan) for every operation under test"""
+    counter = {'n': 0}
+
+    def unique():
+        counter['n'] += 1
+        return f'{time.time_ns()}-{counter["n"]}'
+
+    def random_user():
+        return rng.randint(1, max_user)
+
+    def random_ticket():
+        return rng.randint(1, max_ticket)
+
+    def create_then_delete_ticket():
+        ticket = db.create_ticket(random_user(), 'Bench', 'Benchmark ticket', 'Technical', 'Low')
+        db.delete_ticket(ticket['id'])
+
+    def create_then_delete_user():
+        user_id = db.create_user(f'bench-{unique()}@example.com', 'x', 'Bench')
+        db.delete_user(user_id)
+
+    def bulk_reclassify():
+        changes = []
+        for _ in range(10):
+            ticket = db.get_ticket_by_id(random_ticket())
+            if ticket:
+                changes.append({'id': ticket['id'], 'old_category': ticket['category'],
+                                'old_priority': ticket['priority'],
+                                'category': ticket['category'], 'priority': ticket['priority']})
+        db.bulk_reclassify(changes, 0, 'bench')
+
+    departments = parse_distribution(DEFAULT_CATEGORY)[0]
+
+    def admin_tickets_first_page():
+        conn = db.get_connection()
+        conn.execute(ADMIN_TICKETS_QUERY + ' LIMIT 50').fetchall()
+        conn.close()
+
+    return [
+        ('get_user_by_email', lambda: db.get_user_by_email(f'user{random_user()}@example.com'), False),
+        ('get_user_by_id', lambda: db.get_user_by_id(random_user()), False),
+        ('create_user + delete_user', create_then_delete_user, False),
+        ('update_user_password', lambda: db.update_user_password(random_user(), 'x'), False),
+        ('create_ticket + delete_ticket', create_then_delete_ticket, False),
+        ('get_tickets_by_user', lambda: db.get_tickets_by_user(random_user()), False),
+        ('get_tickets_by_user(status)', lambda: db.get_tickets_by_user(random_user(), 'Open'), False),
+        ('get_ticket_by_id', lambda: db.get_ticket_by_id(random_ticket()), False),
+        ('update_ticket_status', lambda: db.update_ticket_status(random_ticket(), 'In Progress', 0), False),
+        ('add_ticket_history', lambda: db.add_ticket_history(random_ticket(), 'Bench', 0), False),
+        ('get_recent_activities', lambda: db.get_recent_activities(random_user()), False),
+        ('get_tickets_after', lambda: db.get_tickets_after(random_ticket(), 256), False),
+        ('bulk_reclassify(10)', bulk_reclassify, False),
+        ('admin_update_ticket', lambda: db.admin_update_ticket(random_ticket(), 'Technical', 'Low', 'Open'), False),
+        ('claim_next_ticket', lambda: db.claim_next_ticket(rng.choice(departments)), False),
+        ('admin tickets (first page)', admin_tickets_first_page, False),
+        ('admin users (full listing)', lambda: fetch_all(db, ADMIN_USERS_QUERY), True),
+        ('admin tickets (full listing)', lambda: fetch_all(db, ADMIN_TICKETS_QUERY), True),
+    ]
+
+
+def plan_warnings(db_path, statements):
+    """EXPLAIN QUERY PLAN each statement and collect scans / temp B-trees"""
+    conn = sqlite3.connect(db_path)
+    warnings = set()
+    for statement in statements:
+        if not statement.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE')):
+            continue
+        try:
+            plan = conn.execute('EXPLAIN QUERY PLAN ' + statement).fetchall()
+        except sqlite3.Error:
+            continue
+        for row in plan:
+            detail = row[-1]
+            if 'sqlite_sequence' in detail:
+                continue  # one row per table, never grows
+            if (detail.startswith('SCAN') and 'INDEX' not in detail) or 'TEMP B-TREE' in detail:
+                warnings.add(detail)
+    conn.close()
+    return sorted(warnings)
+
+
+def run_size(db_path, repeat, full_scan_repeat, seed):
+    """Time every operation against the database as it is now"""
+    db = TracingDatabase(db_path)
+    conn = sqlite3.connect(db.db_path)
+    max_user = conn.execute('SELECT MAX(id) FROM users').fetchone()[0]
+    max_ticket = conn.execute('SELECT MAX(id) FROM tickets').fetchone()[0]
+    conn.close()
+
+    rng = random.Random(seed)
+    results = {}
+
+    for name, operation, full_scan in build_operations(db, rng, max_user, max_ticket):
+        # First call: warm the page cache and capture the SQL for plan checks
+        db.statements = []
+        operation()
+        statements, db.statements = db.statements, None
+
+        timings = []
+        for _ in range(full_scan_repeat if full_scan else repeat):
+            started = time.perf_counter()
+            operation()
+            timings.append((time.perf_counter() - started) * 1000)
+
+        results[name] = {
+            'p50_ms': statistics.median(timings),
+            'p95_ms': sorted(timings)[max(0, int(len(timings) * 0.95) - 1)],
+            'plan_warnings': plan_warnings(db.db_path, statements),
+        }
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark Database methods as data grows')
+    parser.add_argument('--db', default='database/bench.db', help='Benchmark database (relative to backend/)')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 1000000, 10000000],
+                        help='Ticket counts to benchmark at, smallest first')
+    parser.add_argument('--repeat', type=int, default=100, help='Timed calls per operation')
+    parser.add_argument('--full-scan-repeat', type=int, default=3, help='Timed calls for full listings')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write results as JSON')
+    args = parser.parse_args()
+
+    report = {}
+    for size in sorted(args.sizes):
+        print(f"\n🧪 Preparing {size:,} tickets...")
+        generate(args.db, size, seed=args.seed)
+
+        print(f"⏱️  Benchmarking at {size:,} tickets...")
+        report[size] = run_size(args.db, args.repeat, args.full_scan_repeat, args.seed)
+
+    sizes = sorted(report)
+    names = list(report[sizes[0]])
+
+    print("\n" + "=" * 60)
+    print("📈 p50 latency (ms) by ticket count")
+    print("=" * 60)
+    header = f"{'operation':<32}" + ''.join(f"{size:>12,}" for size in sizes)
+    print(header + (f"{'growth':>9}" if len(sizes) > 1 else ''))
+    for name in names:
+        line = f"{name:<32}" + ''.join(f"{report[size][name]['p50_ms']:>12.2f}" for size in sizes)
+        if len(sizes) > 1:
+            first, last = report[sizes[0]][name]['p50_ms'], report[sizes[-1]][name]['p50_ms']
+            line += f"{last / max(first, 1e-6):>8.0f}x"
+        print(line)
+
+    warnings = {name: report[sizes[-1]][name]['plan_warnings'] for name in names}
+    if any(warnings.values()):
+        print("\n⚠️  Query plans that grow with table size:")
+        for name, details in warnings.items():
+            for detail in details:
+                print(f"   {name}: {detail}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({str(size): results for size, results in report.items()}, f, indent=2)
+        print(f"\n✅ Results written to {args.output}")
+    print()
@@ -0,0 +1,407 @@
+import argparse
+import threading
+import time
+import os
+
+import numpy as np
+
+from models import Database
+
+# Cross-process lock for appends: flock on POSIX, msvcrt on Windows
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+
+def lock_file(f):
+    """Block until this process holds the exclusive lock on an open file"""
+    if fcntl is not None:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        return
+    f.seek(0)
+    while True:
+        try:
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)  # first byte stands for the file
+            return
+        except OSError:
+            pass  # LK_LOCK gives up after ~10s of contention; keep waiting
+
+
+def unlock_file(f):
+    """Release a lock taken with lock_file"""
+    if fcntl is not None:
+        fcntl.flock(f, fcntl.LOCK_UN)
+        return
+    f.seek(0)
+    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class EmbeddingStore:
+    """
+    Append-only, memory-mapped store of ticket BERT embeddings
+    Each record is (ticket id, vector norm, vector); vectors are kept raw so
+    the classifier heads can reuse them, and cosine search divides by the
+    stored norm.
+    """
+
+    # A reindex lock file older than this belongs to a worker that died mid-build
+    STALE_LOCK_SECONDS = 3600
+
+    def __init__(self, store_path='database/embeddings.bin', dim=768, dtype='float16', reindex_after=0):
+        """
+        Open (or create) the store file
+
+        Once more than `reindex_after` records are outside the IVF index, a
+        background thread indexes them, so brute-force scanning stays bounded.
+        0 (the default, for the CLIs) leaves indexing to --build-index.
+        """
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        self.store_path = os.path.join(base_dir, store_path)
+        self.dim = dim
+        self.reindex_after = reindex_after
+
+        self.record_dtype = np.dtype([
+            ('id', '<i8'),
+            ('norm', '<f4'),
+            ('vector', dtype, (dim,))
+        ])
+
+        os.makedirs(os.path.dirname(self.store_path), exist_ok=True)
+        open(self.store_path, 'ab').close()
+
+        self._records = None
+        self._index = None
+        self._lock = threading.Lock()
+        self._reindexing = None
+
+    def _load(self):
+        """Memory-map the file, remapping when other workers appended to it"""
+        count = os.path.getsize(self.store_path) // self.record_dtype.itemsize
+
+        if self._records is None or len(self._records) != count:
+            if count == 0:
+                self._records = np.zeros(0, dtype=self.record_dtype)
+            else:
+                self._records = np.memmap(self.store_path, dtype=self.record_dtype,
+                                          mode='r', shape=(count,))
+        return self._records
+
+    def __len__(self):
+        return len(self._load())
+
+    # WRITES
+
+    def add_many(self, ticket_ids, embeddings):
+        """Append embeddings for several tickets in one write"""
+        embeddings = np.asarray(embeddings, dtype=np.float32).reshape(len(ticket_ids), self.dim)
+
+        records = np.zeros(len(ticket_ids), dtype=self.record_dtype)
+        records['id'] = ticket_ids
+        records['norm'] = np.linalg.norm(embeddings, axis=1)
+        records['vector'] = embeddings
+
+        # The file lock keeps records from different gunicorn workers whole
+        with self._lock, open(self.store_path, 'ab') as f:
+            lock_file(f)
+            try:
+                f.write(records.tobytes())
+                f.flush()
+            finally:
+                unlock_file(f)
+
+        self.reindex_in_background()
+
+    def add(self, ticket_id, embedding):
+        """Append the embedding of one ticket"""
+        self.add_many([ticket_id], [embedding])
+
+    # READS
+
+    def get_many(self, ticket_ids):
+        """Return {ticket_id: float32 vector} for the ids that are stored"""
+        records = self._load()
+        if len(records) == 0:
+            return {}
+
+        positions = np.flatnonzero(np.isin(records['id'], ticket_ids))
+
+        # Later records win when a ticket was embedded more than once
+        return {
+            int(records['id'][i]): np.asarray(records['vector'][i], dtype=np.float32)
+            for i in positions
+        }
+
+    def get(self, ticket_id):
+        """Return the stored vector of one ticket, or None"""
+        return self.get_many([ticket_id]).get(ticket_id)
+
+    def _normalized(self, records):
+        """Unit-length float32 copies of the vectors in records"""
+        vectors = records['vector'].astype(np.float32)
+        vectors /= np.maximum(records['norm'], 1e-12)[:, None]
+        return vectors
+
+    def _top_candidates(self, records, query, take):
+        """Best `take` (ids, scores) of a slice of records"""
+        scores = records['vector'].astype(np.float32) @ query
+        scores /= np.maximum(records['norm'], 1e-12)
+
+        take = min(take, len(scores))
+        top = np.argpartition(-scores, take - 1)[:take]
+        return records['id'][top], scores[top]
+
+    # IVF INDEX
+
+    @property
+    def index_path(self):
+        return self.store_path + '.ivf.npz'
+
+    def build_index(self, n_lists=None, iterations=10, sample_size=20000, block_size=8192):
+        """
+        Partition stored vectors into n_lists clusters (spherical k-means on
+        a sample) so search only scores the closest clusters. Records added
+        after the build are still searched by brute force.
+        """
+        records = self._load()
+        count = len(records)
+        if count == 0:
+            return
+
+        n_lists = n_lists or max(1, int(np.sqrt(count)))
+        rng = np.random.default_rng(0)
+
+        sample = np.sort(rng.choice(count, size=min(sample_size, count), replace=False))
+        sample_vectors = self._normalized(records[sample])
+        centroids = sample_vectors[rng.choice(len(sample_vectors), size=min(n_lists, len(sample_vectors)), replace=False)]
+
+        for _ in range(iterations):
+            assignment = np.argmax(sample_vectors @ centroids.T, axis=1)
+            for i in range(len(centroids)):
+                members = sample_vectors[assignment == i]
+                if len(members):
+                    centroid = members.mean(axis=0)
+                    centroids[i] = centroid / max(np.linalg.norm(centroid), 1e-12)
+
+        assignment = np.concatenate([
+            np.argmax(self._normalized(records[start:start + block_size]) @ centroids.T, axis=1)
+            for start in range(0, count, block_size)
+        ])
+        order = np.argsort(assignment, kind='stable')
+        offsets = np.searchsorted(assignment[order], np.arange(len(centroids) + 1))
+
+        tmp_path = self.index_path + '.tmp.npz'
+        np.savez(tmp_path, centroids=centroids, order=order, offsets=offsets,
+                 indexed_count=count, clustered_count=count)
+        os.replace(tmp_path, self.index_path)
+        self._index = None
+
+    def extend_index(self, block_size=8192):
+        """
+        Add records appended since the last build to the existing clusters
+        (no re-clustering, so it only costs one pass over the new records)
+        """
+        index = self._load_index()
+        records = self._load()
+        if index is None:
+            return self.build_index()
+
+        indexed_count, count = int(index['indexed_count']), len(records)
+        if count <= indexed_count:
+            return
+
+        centroids = index['centroids']
+        new_assignment = np.concatenate([
+            np.argmax(self._normalized(records[start:min(start + block_size, count)]) @ centroids.T, axis=1)
+            for start in range(indexed_count, count, block_size)
+        ])
+        old_assignment = np.repeat(np.arange(len(centroids)), np.diff(index['offsets']))
+
+        positions = np.concatenate([index['order'], np.arange(indexed_count, count)])
+        assignment = np.concatenate([old_assignment, new_assignment])
+        order = np.argsort(assignment, kind='stable')
+        offsets = np.searchsorted(assignment[order], np.arange(len(centroids) + 1))
+
+        tmp_path = self.index_path + '.tmp.npz'
+        np.savez(tmp_path, centroids=centroids, order=positions[order], offsets=offsets,
+                 indexed_count=count, clustered_count=int(index.get('clustered_count', indexed_count)))
+        os.replace(tmp_path, self.index_path)
+        self._index = None
+
+    def unindexed_count(self):
+        """Records that search has to score by brute force"""
+        index = self._load_index()
+        return len(self._load()) - (int(index['indexed_count']) if index is not None else 0)
+
+    def reindex(self):
+        """
+        Index the unindexed tail: extend the clusters, or re-cluster once the
+        store has doubled since they were computed. A lock file next to the
+        store makes sure only one worker does it.
+
+        Returns:
+            bool: whether this call updated the index
+        """
+        lock_path = self.index_path + '.lock'
+        try:
+            if time.time() - os.path.getmtime(lock_path) > self.STALE_LOCK_SECONDS:
+                os.remove(lock_path)
+        except OSError:
+            pass
+
+        try:
+            os.close(os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except FileExistsError:
+            return False  # another worker is on it
+
+        try:
+            index = self._load_index()
+            if index is None or len(self._load()) >= 2 * int(index.get('clustered_count', index['indexed_count'])):
+                self.build_index()
+            else:
+                self.extend_index()
+            return True
+        finally:
+            os.remove(lock_path)
+
+    def reindex_in_background(self):
+        """Start reindex() on a thread once the unindexed tail passes reindex_after"""
+        if not self.reindex_after or self.unindexed_count() < self.reindex_after:
+            return
+        with self._lock:
+            if self._reindexing is not None and self._reindexing.is_alive():
+                return
+
+            def run():
+                try:
+                    if self.reindex():
+                        print(f"✅ Embedding index updated ({len(self)} records)")
+                except Exception as e:
+                    print(f"⚠️ Embedding reindex failed: {e}")
+
+            self._reindexing = threading.Thread(target=run, name='embedding-reindex', daemon=True)
+            self._reindexing.start()
+
+    def _load_index(self):
+        """Load the IVF index if one was built (reloaded when rebuilt)"""
+        if not os.path.exists(self.index_path):
+            return None
+
+        mtime = os.path.getmtime(self.index_path)
+        index = self._index
+        if index is None or index['mtime'] != mtime:
+            with np.load(self.index_path) as data:
+                index = {key: data[key] for key in data.files}
+            index['mtime'] = mtime
+            self._index = index
+        return index
+
+    # SEARCH
+
+    def search(self, embedding, k=5, exclude_ids=(), n_probe=8, block_size=8192, among=None):
+        """
+        Cosine top-k. With an IVF index only the n_probe closest clusters
+        (plus records added since the build) are scored; otherwise every
+        record is scored, one block at a time so memory stays bounded.
+        A long unindexed tail triggers a background reindex. With `among`
+        only those ticket ids are scored, exactly (e.g. one user's tickets).
+
+        Returns:
+            list: [(ticket_id, similarity), ...] best first
+        """
+        records = self._load()
+        if len(records) == 0 or k <= 0:
+            return []
+
+        query = np.asarray(embedding, dtype=np.float32).reshape(-1)
+        query = query / max(np.linalg.norm(query), 1e-12)
+
+        exclude_ids = set(exclude_ids)
+        # Extra candidates cover excluded and re-embedded tickets
+        take = 2 * k + len(exclude_ids)
+
+        candidates = []
+        index = self._load_index() if among is None else None
+
+        if among is not None:
+            # A known subset is small: score it directly, no index or tail scan
+            positions = np.flatnonzero(np.isin(records['id'], np.fromiter(among, dtype=np.int64)))
+            if len(positions):
+                candidates.append(self._top_candidates(records[positions], query, take))
+            indexed_count = len(records)
+        elif index is not None:
+            indexed_count = int(index['indexed_count'])
+            lists = np.argsort(-(index['centroids'] @ query))[:n_probe]
+            positions = np.sort(np.concatenate([
+                index['order'][index['offsets'][i]:index['offsets'][i + 1]] for i in lists
+            ]))
+            if len(positions):
+                candidates.append(self._top_candidates(records[positions], query, take))
+        else:
+            indexed_count = 0
+
+        for start in range(indexed_count, len(records), block_size):
+            candidates.append(self._top_candidates(records[start:start + block_size], query, take))
+
+        if self.reindex_after and len(records) - indexed_count >= self.reindex_after:
+            self.reindex_in_background()
+
+        if not candidates:
+            return []
+
+        candidate_ids = np.concatenate([ids for ids, _ in candidates])
+        candidate_scores = np.concatenate([scores for _, scores in candidates])
+
+        results, seen = [], set(exclude_ids)
+        for i in np.argsort(-candidate_scores):
+            ticket_id = int(candidate_ids[i])
+            if ticket_id in seen:
+                continue
+            seen.add(ticket_id)
+            results.append((ticket_id, float(candidate_scores[i])))
+            if len(results) == k:
+                break
+
+        return results
+
+
+# Embed tickets created before the store existed
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Backfill the ticket embedding store')
+    parser.add_argument('--chunk-size', type=int, default=256)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--build-index', action='store_true',
+                        help='Rebuild the IVF index afterwards (worth it from ~100k tickets)')
+    parser.add_argument('--lists', type=int, default=None, help='IVF cluster count (default sqrt(n))')
+    args = parser.parse_args()
+
+    from ml_predictor import TicketPredictor
+
+    db = Database()
+    predictor = TicketPredictor()
+    store = EmbeddingStore(dim=predictor.bert_model.config.hidden_size)
+
+    print(f"\n🔄 Backfilling embeddings ({len(store)} stored so far)...\n")
+
+    last_id, added = 0, 0
+    started = time.time()
+    while True:
+        tickets = db.get_tickets_after(last_id, args.chunk_size)
+        if not tickets:
+            break
+        last_id = tickets[-1]['id']
+
+        stored = store.get_many([ticket['id'] for ticket in tickets])
+        missing = [ticket for ticket in tickets if ticket['id'] not in stored]
+        if missing:
+            embeddings = predictor.embed_batch([t['description'] for t in missing], args.batch_size)
+            store.add_many([t['id'] for t in missing], embeddings)
+            added += len(missing)
+
+    print(f"✅ Added {added} embedding(s) in {time.time() - started:.1f}s")
+
+    if args.build_index:
+        started = time.time()
+        store.build_index(args.lists)
+        print(f"✅ IVF index built over {len(store)} embedding(s) in {time.time() - started:.1f}s")
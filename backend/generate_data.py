@@ -0,0 +1,224 @@
+"""
+Fill a database with realistic synthetic users, tickets, history and activities
+
+    python generate_data.py --db database/bench.db --tickets 1000000
+    python generate_data.py --db database/bench.db --tickets 10000 \\
+        --status "Open=0.5,In Progress=0.3,Closed=0.2" --priority "Critical=0.2,High=0.3,Medium=0.3,Low=0.2"
+
+Rows are appended: running it again on the same file tops the tables up to
+the requested ticket count. Ticket rollups are rebuilt afterwards so the
+analytics (and later updates) start from the generated tickets. Never point
+it at the production database.
+"""
+from datetime import datetime, timedelta
+import argparse
+import sqlite3
+import random
+import time
+
+from werkzeug.security import generate_password_hash
+
+from models import Database
+
+
+DEFAULT_STATUS = 'Open=0.25,In Progress=0.15,Closed=0.6'
+DEFAULT_PRIORITY = 'Critical=0.05,High=0.2,Medium=0.45,Low=0.3'
+DEFAULT_CATEGORY = 'Technical=0.35,Billing=0.25,Account=0.2,Fraud=0.05,General Inquiry=0.15'
+
+FIRST_NAMES = ['Aarav', 'Priya', 'John', 'Maria', 'Wei', 'Fatima', 'Lucas', 'Emma', 'Ravi', 'Sofia',
+               'Kenji', 'Amara', 'Noah', 'Olivia', 'Arjun', 'Chen', 'Liam', 'Zara', 'Mateo', 'Ananya']
+LAST_NAMES = ['Sharma', 'Smith', 'Garcia', 'Wang', 'Khan', 'Silva', 'Muller', 'Reddy', 'Kim', 'Okafor',
+              'Rossi', 'Tanaka', 'Patel', 'Brown', 'Nguyen', 'Lopez', 'Ivanov', 'Cohen', 'Singh', 'Jones']
+
+TEMPLATES = {
+    'Technical': [
+        ('App crashes on {thing}', 'The mobile app keeps crashing whenever I try to {action}. I reinstalled it but the problem is still there.'),
+        ('Page not loading', 'The {thing} page shows a blank screen after login. Tried {browser} and cleared the cache.'),
+        ('Error code {code}', 'I get error {code} when I {action}. This started after the last update.'),
+    ],
+    'Billing': [
+        ('Charged twice', 'My card was charged twice for the same {thing} on {date}. Please refund the duplicate payment.'),
+        ('Refund not received', 'I was promised a refund for my {thing} order but it has not arrived after {days} days.'),
+        ('Wrong invoice amount', 'The invoice for {date} shows a higher amount than my plan. Please correct it.'),
+    ],
+    'Account': [
+        ('Cannot log in', 'I forgot my password and the reset email never arrives. I need access to my account to {action}.'),
+        ('Update email address', 'Please change the email on my account, I no longer use the old address.'),
+        ('Account locked', 'My account was locked after too many attempts while trying to {action}.'),
+    ],
+    'Fraud': [
+        ('Unauthorized transaction', 'There is a transaction on {date} I did not make. Someone may have used my card.'),
+        ('Suspicious login', 'I received an alert about a login from a device I do not own. Please secure my account.'),
+    ],
+    'General Inquiry': [
+        ('Question about {thing}', 'Could you tell me how {thing} works and whether it is included in my plan?'),
+        ('Business hours', 'What are your support hours? I need help to {action} during the weekend.'),
+    ],
+}
+
+FILLERS = {
+    'thing': ['checkout', 'profile', 'subscription', 'dashboard', 'photo upload', 'order history', 'premium plan'],
+    'action': ['upload photos', 'pay my bill', 'update my profile', 'download my invoice', 'track my order'],
+    'browser': ['Chrome', 'Firefox', 'Safari', 'Edge'],
+    'code': ['500', '403', 'E1024', 'TIMEOUT', '0x80070005'],
+}
+
+
+def parse_distribution(value):
+    """'A=0.5,B=0.5' -> (['A', 'B'], [0.5, 0.5])"""
+    values, weights = [], []
+    for part in value.split(','):
+        name, weight = part.rsplit('=', 1)
+        values.append(name.strip())
+        weights.append(float(weight))
+    return values, weights
+
+
+def fmt(moment):
+    """Same format as SQLite's CURRENT_TIMESTAMP"""
+    return moment.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def make_text(rng, category, created):
+    """Title and description for a ticket of a category"""
+    title, description = rng.choice(TEMPLATES.get(category, TEMPLATES['General Inquiry']))
+    fill = {key: rng.choice(options) for key, options in FILLERS.items()}
+    fill['date'] = created.strftime('%b %d')
+    fill['days'] = rng.randint(3, 30)
+    return title.format(**fill), description.format(**fill)
+
+
+def generate(db_path, tickets, tickets_per_user=20, status=DEFAULT_STATUS, priority=DEFAULT_PRIORITY,
+             category=DEFAULT_CATEGORY, days=730, batch_size=50000, seed=0):
+    """
+    Top the database at db_path up to `tickets` tickets (plus users, history
+    and activities in proportion)
+
+    Returns:
+        dict: rows added per table
+    """
+    db = Database(db_path)
+    rng = random.Random(seed + tickets)
+
+    status_values, status_weights = parse_distribution(status)
+    priority_values, priority_weights = parse_distribution(priority)
+    category_values, category_weights = parse_distribution(category)
+
+    conn = sqlite3.connect(db.db_path)
+    # Bulk-load settings for this connection only
+    conn.execute('PRAGMA synchronous = OFF')
+    conn.execute('PRAGMA journal_mode = MEMORY')
+    cursor = conn.cursor()
+
+    existing_users = cursor.execute('SELECT COALESCE(MAX(id), 0) FROM users').fetchone()[0]
+    existing_tickets = cursor.execute('SELECT COALESCE(MAX(id), 0) FROM tickets').fetchone()[0]
+    target_users = max(1, tickets // tickets_per_user)
+
+    added = {'users': 0, 'tickets': 0, 'ticket_history': 0, 'activities': 0}
+    now = datetime.utcnow()
+    started = time.time()
+
+    # USERS (one shared hash: hashing millions of passwords would dominate the run)
+    password = generate_password_hash('password123')
+    for batch_start in range(existing_users + 1, target_users + 1, batch_size):
+        batch_end = min(batch_start + batch_size, target_users + 1)
+        rows = []
+        for user_id in range(batch_start, batch_end):
+            created = now - timedelta(days=days, seconds=rng.randint(0, 86400 * 30))
+            rows.append((user_id, f'user{user_id}@example.com', password,
+                         f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}', fmt(created)))
+        cursor.executemany(
+            'INSERT INTO users (id, email, password, name, created_at) VALUES (?, ?, ?, ?, ?)', rows
+        )
+        conn.commit()
+        added['users'] += len(rows)
+
+    user_count = max(existing_users, target_users)
+
+    # TICKETS + HISTORY + ACTIVITIES
+    for batch_start in range(existing_tickets + 1, tickets + 1, batch_size):
+        batch_end = min(batch_start + batch_size, tickets + 1)
+        size = batch_end - batch_start
+
+        statuses = rng.choices(status_values, status_weights, k=size)
+        priorities = rng.choices(priority_values, priority_weights, k=size)
+        categories = rng.choices(category_values, category_weights, k=size)
+
+        ticket_rows, history_rows, activity_rows = [], [], []
+        for offset, ticket_id in enumerate(range(batch_start, batch_end)):
+            # A few heavy users, a long tail of light ones
+            user_id = min(user_count, int(rng.paretovariate(1.2))) if rng.random() < 0.2 else rng.randint(1, user_count)
+            created = now - timedelta(seconds=rng.randint(0, days * 86400))
+            ticket_status = statuses[offset]
+            ticket_number = f'TKT-{ticket_id:05d}'
+            title, description = make_text(rng, categories[offset], created)
+
+            history_rows.append((ticket_id, 'Created', user_id, fmt(created)))
+            activity_rows.append((user_id, 'ticket_created', f'Created ticket {ticket_number}', fmt(created)))
+
+            updated = created
+            if ticket_status in ('In Progress', 'Closed'):
+                updated = min(now, created + timedelta(minutes=rng.randint(5, 60 * 24 * 3)))
+                history_rows.append((ticket_id, 'Status changed to In Progress', user_id, fmt(updated)))
+            if ticket_status == 'Closed':
+                updated = min(now, updated + timedelta(minutes=rng.randint(10, 60 * 24 * 10)))
+                history_rows.append((ticket_id, 'Status changed to Closed', user_id, fmt(updated)))
+
+            ticket_rows.append((ticket_id, ticket_number, user_id, title, description, categories[offset],
+                                priorities[offset], ticket_status, fmt(created), fmt(updated)))
+
+        cursor.executemany('''
+            INSERT INTO tickets (id, ticket_number, user_id, title, description, category, priority,
+                                 status, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', ticket_rows)
+        cursor.executemany(
+            'INSERT INTO ticket_history (ticket_id, action, changed_by, timestamp) VALUES (?, ?, ?, ?)',
+            history_rows
+        )
+        cursor.executemany(
+            'INSERT INTO activities (user_id, activity_type, description, timestamp) VALUES (?, ?, ?, ?)',
+            activity_rows
+        )
+        conn.commit()
+
+        added['tickets'] += len(ticket_rows)
+        added['ticket_history'] += len(history_rows)
+        added['activities'] += len(activity_rows)
+
+        elapsed = time.time() - started
+        print(f"   {batch_end - 1:,} / {tickets:,} tickets ({added['tickets'] / elapsed:,.0f} tickets/sec)")
+
+    if added['tickets']:
+        # Rows inserted here bypass Database, so its rollups know nothing of them
+        Database.rebuild_rollups(cursor)
+        conn.commit()
+
+    conn.execute('ANALYZE')
+    conn.close()
+
+    return added
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Generate synthetic ticket data')
+    parser.add_argument('--db', default='database/bench.db', help='Database file (relative to backend/)')
+    parser.add_argument('--tickets', type=int, default=100000, help='Total tickets wanted in the database')
+    parser.add_argument('--tickets-per-user', type=int, default=20)
+    parser.add_argument('--status', default=DEFAULT_STATUS, help='Status distribution, e.g. "Open=0.3,Closed=0.7"')
+    parser.add_argument('--priority', default=DEFAULT_PRIORITY, help='Priority distribution')
+    parser.add_argument('--category', default=DEFAULT_CATEGORY, help='Department distribution')
+    parser.add_argument('--days', type=int, default=730, help='Spread creation dates over this many days')
+    parser.add_argument('--batch-size', type=int, default=50000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"\n🧪 Generating up to {args.tickets:,} tickets in {args.db}...\n")
+    started = time.time()
+
+    added = generate(args.db, args.tickets, args.tickets_per_user, args.status, args.priority,
+                     args.category, args.days, args.batch_size, args.seed)
+
+    print(f"\n✅ Added {added['users']:,} users, {added['tickets']:,} tickets, "
+          f"{added['ticket_history']:,} history rows, {added['activities']:,} activities "
+          f"in {time.time() - started:.1f}s\n")
@@ -0,0 +1,189 @@
+"""
+Concurrency / tail-latency load test for the API
+
+Run the same scenario against each deployment and compare:
+
+    gunicorn app:app --bind :8000                 # sync workers
+    uvicorn asgi:application --port 8001          # ASGI mode
+
+    python loadtest.py --url http://127.0.0.1:8000 --email a@b.c --password secret
+    python loadtest.py --url http://127.0.0.1:8001 --email a@b.c --password secret
+
+Start both servers with a high RATE_LIMIT_PREVIEW and RATE_LIMIT_CREATE
+(e.g. 100000/60) so the comparison measures serving capacity rather than
+the per-user limiter. The create step writes real tickets, so point it at a
+throwaway database; it is what exercises concurrent SQLite writes.
+
+Each concurrency level runs for --duration seconds with that many
+connections sending requests back to back. Only the standard library is
+used (asyncio streams, HTTP/1.1 keep-alive).
+"""
+from urllib.parse import urlsplit
+import statistics
+import argparse
+import asyncio
+import json
+import time
+
+
+# Mix of requests per simulated user: mostly reads, some inference and writes
+SCENARIO = [
+    ('GET', '/api/tickets', None),
+    ('GET', '/api/user/activities', None),
+    ('POST', '/api/ai/predict', {'text': 'I was charged twice for my subscription this month'}),
+    ('POST', '/api/tickets/create', {'title': 'Double charge',
+                                     'description': 'I was charged twice for my subscription this month'}),
+    ('GET', '/api/health', None),
+]
+
+
+class Connection:
+    """Minimal keep-alive HTTP/1.1 client connection"""
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+
+    async def request(self, method, path, headers, body=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+        payload = json.dumps(body).encode() if body is not None else b''
+        lines = [f'{method} {path} HTTP/1.1', f'Host: {self.host}',
+                 f'Content-Length: {len(payload)}', 'Content-Type: application/json']
+        lines += [f'{name}: {value}' for name, value in headers.items()]
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode() + payload)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError('Server closed the connection')
+        status = int(status_line.split()[1])
+
+        response_headers = {}
+        while True:
+            line = (await self.reader.readline()).decode().strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            response_headers[name.lower()] = value.strip()
+
+        if response_headers.get('transfer-encoding') == 'chunked':
+            data = b''
+            while True:
+                size = int((await self.reader.readline()).strip(), 16)
+                chunk = await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+                data += chunk[:-2]
+        else:
+            data = await self.reader.readexactly(int(response_headers.get('content-length', 0)))
+
+        if response_headers.get('connection', '').lower() == 'close':
+            self.close()
+
+        return status, data
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+async def login(host, port, email, password):
+    """Get a JWT for the test user"""
+    conn = Connection(host, port)
+    status, data = await conn.request('POST', '/api/auth/login', {},
+                                      {'email': email, 'password': password})
+    conn.close()
+    if status != 200:
+        raise SystemExit(f'❌ Login failed ({status}): {data.decode()}')
+    return json.loads(data)['access_token']
+
+
+async def user_loop(host, port, headers, deadline, results):
+    """One simulated client sending the scenario until the deadline"""
+    conn = Connection(host, port)
+    step = 0
+    while time.perf_counter() < deadline:
+        method, path, body = SCENARIO[step % len(SCENARIO)]
+        step += 1
+        started = time.perf_counter()
+        try:
+            status, _ = await conn.request(method, path, headers, body)
+            results.append((time.perf_counter() - started, status))
+        except Exception:
+            conn.close()
+            results.append((time.perf_counter() - started, 0))
+    conn.close()
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    return statistics.quantiles(values, n=100, method='inclusive')[pct - 1] if len(values) > 1 else values[0]
+
+
+async def run_level(host, port, headers, concurrency, duration):
+    """Run one concurrency level and summarize it"""
+    results = []
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(*[
+        user_loop(host, port, headers, deadline, results) for _ in range(concurrency)
+    ])
+
+    ok = [latency for latency, status in results if 200 <= status < 300]
+    limited = sum(1 for _, status in results if status == 429)
+    errors = len(results) - len(ok) - limited
+
+    return {
+        'concurrency': concurrency,
+        'requests': len(results),
+        'rps': len(results) / duration,
+        'p50_ms': percentile(ok, 50) * 1000,
+        'p95_ms': percentile(ok, 95) * 1000,
+        'p99_ms': percentile(ok, 99) * 1000,
+        'rate_limited': limited,
+        'errors': errors,
+    }
+
+
+async def main(args):
+    url = urlsplit(args.url)
+    host, port = url.hostname, url.port or 80
+
+    token = args.token or await login(host, port, args.email, args.password)
+    headers = {'Authorization': f'Bearer {token}'}
+
+    print(f"\n🚀 Load testing {args.url} ({args.duration}s per level)\n")
+    print(f"{'conc':>6} {'reqs':>8} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'429':>6} {'err':>6}")
+
+    summaries = []
+    for concurrency in args.concurrency:
+        summary = await run_level(host, port, headers, concurrency, args.duration)
+        summaries.append(summary)
+        print(f"{summary['concurrency']:>6} {summary['requests']:>8} {summary['rps']:>8.1f} "
+              f"{summary['p50_ms']:>9.1f} {summary['p95_ms']:>9.1f} {summary['p99_ms']:>9.1f} "
+              f"{summary['rate_limited']:>6} {summary['errors']:>6}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'url': args.url, 'levels': summaries}, f, indent=2)
+        print(f"\n✅ Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='API concurrency and tail-latency load test')
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--token', help='JWT to use instead of logging in')
+    parser.add_argument('--email')
+    parser.add_argument('--password')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 10, 50, 200, 1000])
+    parser.add_argument('--duration', type=float, default=15.0)
+    parser.add_argument('--output', help='Write the summary as JSON')
+    args = parser.parse_args()
+
+    if not args.token and not (args.email and args.password):
+        parser.error('give --token or --email and --password')
+
+    asyncio.run(main(args))
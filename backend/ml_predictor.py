@@ -1,29 +1,36 @@
-import joblib
-import os
+import threading
+import time
 import torch
 import numpy as np
 from transformers import BertTokenizer, BertModel
 import warnings
 warnings.filterwarnings("ignore")
 
+from model_registry import ModelRegistry, LEGACY_VERSION
+
 class TicketPredictor:
     """
     AI-powered ticket classifier using BERT embeddings + LogisticRegression
     Predicts department and priority from customer complaints
     """
     
-    def __init__(self):
+    # Sentence pushed through newly loaded heads before they take traffic
+    WARMUP_TEXT = "I was charged twice and cannot log into my account"
+    
+    def __init__(self, registry=None, exit_threshold=None, exit_fallback=LEGACY_VERSION):
+        """
+        Args:
+            registry (ModelRegistry): where the classifier heads come from
+            exit_threshold (float): with heads trained on fewer layers, predictions
+                less confident than this finish the encoder and use exit_fallback
+            exit_fallback (str): full-depth heads version for those predictions
+        """
         print("🔄 Loading AI models...")
         
-        # Get the directory where this file is located
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        models_dir = os.path.join(base_dir, 'models')
-        
-        # Load your trained LogisticRegression models and encoders
-        self.dept_model = joblib.load(os.path.join(models_dir, 'dept_model.pkl'))
-        self.dept_encoder = joblib.load(os.path.join(models_dir, 'dept_encoder.pkl'))
-        self.prio_model = joblib.load(os.path.join(models_dir, 'prio_model.pkl'))
-        self.prio_encoder = joblib.load(os.path.join(models_dir, 'prio_encoder.pkl'))
+        # Versioned LogisticRegression heads (falls back to the pickles in models/)
+        self.registry = registry or ModelRegistry()
+        self._reload_lock = threading.Lock()
+        self._watcher = None
         
         # Load BERT model and tokenizer from Hugging Face
         print("🔄 Loading BERT model (this may take a moment)...")
@@ -32,16 +39,93 @@ class TicketPredictor:
         self.bert_model = BertModel.from_pretrained("bert-base-uncased")
         self.bert_model.to(self.device)
         self.bert_model.eval()
+        self.num_layers = self.bert_model.config.num_hidden_layers
         
-        # Store available categories
-        self.departments = self.dept_encoder.classes_.tolist()
-        self.priorities = self.prio_encoder.classes_.tolist()
+        # Confidence-based early exit (off unless a threshold is given)
+        self.exit_threshold = exit_threshold
+        self.fallback_heads = None
+        if exit_threshold:
+            self.fallback_heads = self._load_heads(exit_fallback)
+            if self.encoder_depth(self.fallback_heads) != self.num_layers:
+                raise ValueError(f'Early-exit fallback {exit_fallback} must use all {self.num_layers} layers')
+        
+        self.heads = self._load_heads(self.registry.current_version())
         
         print("✅ AI models loaded successfully!")
         print(f"   Device: {self.device}")
+        print(f"   Model version: {self.model_version}")
+        print(f"   Encoder layers: {self.encoder_depth()}/{self.num_layers}")
         print(f"   Departments: {', '.join(self.departments)}")
         print(f"   Priorities: {', '.join(self.priorities)}")
     
+    @property
+    def model_version(self):
+        return self.heads.version
+    
+    @property
+    def departments(self):
+        return self.heads.departments
+    
+    @property
+    def priorities(self):
+        return self.heads.priorities
+    
+    # MODEL HOT-RELOAD
+    
+    def encoder_depth(self, heads=None):
+        """Number of BERT layers the heads' embeddings come from"""
+        heads = heads or self.heads
+        depth = heads.layer or self.num_layers
+        if not 1 <= depth <= self.num_layers:
+            raise ValueError(f'Heads {heads.version} expect layer {depth}, BERT has {self.num_layers}')
+        return depth
+    
+    def _load_heads(self, version):
+        """Load a version of the heads and run a warmup prediction through it"""
+        heads = self.registry.load(version)
+        
+        # Fails here (not on live traffic) if the heads don't fit the encoder
+        warmup = self.get_bert_embedding(self.clean_text(self.WARMUP_TEXT), layer=self.encoder_depth(heads))
+        self.predict_from_embeddings(warmup, heads)
+        
+        return heads
+    
+    def reload_models(self, version=None):
+        """
+        Swap in another version of the classifier heads (default: the
+        registry's current one). BERT stays loaded; requests in flight
+        finish on the heads they started with.
+        
+        Returns:
+            str: the version now serving
+        """
+        version = version or self.registry.current_version()
+        
+        with self._reload_lock:
+            if version != self.heads.version:
+                heads = self._load_heads(version)
+                old_version = self.heads.version
+                self.heads = heads
+                print(f"🔄 Model heads swapped: {old_version} → {version}")
+        
+        return self.heads.version
+    
+    def start_watcher(self, interval=30):
+        """Poll the registry and hot-reload when the current version changes"""
+        if self._watcher is not None:
+            return
+        
+        def watch():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.reload_models()
+                except Exception as e:
+                    print(f"⚠️ Model reload failed, keeping {self.model_version}: {e}")
+        
+        self._watcher = threading.Thread(target=watch, name='model-watcher', daemon=True)
+        self._watcher.start()
+    
     def clean_text(self, text):
         """Clean and preprocess text (same as training)"""
         import re
@@ -51,39 +135,97 @@ class TicketPredictor:
         text = re.sub(r'\s+', ' ', text).strip()
         return text
     
-    def get_bert_embedding(self, text, max_length=128):
-        """
-        Convert text to BERT embedding (same process as training)
-        """
-        # Tokenize
-        encoded = self.tokenizer(
+    def _tokenize(self, text, max_length=128):
+        """Tokenize one text or a list of texts for BERT"""
+        return self.tokenizer(
             text,
             padding=True,
             truncation=True,
             max_length=max_length,
             return_tensors="pt"
         ).to(self.device)
+    
+    def _start_encoder(self, encoded):
+        """Token embeddings plus the attention mask the encoder layers expect"""
+        hidden = self.bert_model.embeddings(
+            input_ids=encoded['input_ids'],
+            token_type_ids=encoded.get('token_type_ids')
+        )
+        mask = self.bert_model.get_extended_attention_mask(encoded['attention_mask'], encoded['input_ids'].shape)
+        return hidden, mask
+    
+    def _run_layers(self, hidden, mask, start, stop):
+        """Run the encoder layers after layer `start`, up to and including layer `stop`"""
+        for layer in self.bert_model.encoder.layer[start:stop]:
+            hidden = layer(hidden, attention_mask=mask)[0]
+        return hidden
+    
+    def get_bert_embedding(self, text, max_length=128, layer=None):
+        """
+        Convert text to BERT embedding (same process as training)
+        With `layer`, only the first `layer` encoder layers run.
+        """
+        # Tokenize
+        encoded = self._tokenize(text, max_length)
         
         # Get BERT embedding
         with torch.no_grad():
-            output = self.bert_model(**encoded)
+            if layer is None or layer >= self.num_layers:
+                hidden = self.bert_model(**encoded).last_hidden_state
+            else:
+                hidden, mask = self._start_encoder(encoded)
+                hidden = self._run_layers(hidden, mask, 0, layer)
         
         # Extract [CLS] token embedding (first token)
-        cls_embedding = output.last_hidden_state[:, 0, :].cpu().numpy()
+        cls_embedding = hidden[:, 0, :].cpu().numpy()
         
         return cls_embedding
     
-    def predict(self, complaint_text):
+    def embed_layers(self, complaint_texts, layers, batch_size=32):
+        """
+        CLS embeddings after each of several layers, from one pass per batch
+        
+        Returns:
+            dict: {layer: np.ndarray with one row per text}
+        """
+        layers = sorted(set(layers))
+        cleaned = [self.clean_text(text) for text in complaint_texts]
+        chunks = {layer: [] for layer in layers}
+        
+        for i in range(0, len(cleaned), batch_size):
+            encoded = self._tokenize(cleaned[i:i + batch_size])
+            with torch.no_grad():
+                hidden, mask = self._start_encoder(encoded)
+                done = 0
+                for layer in layers:
+                    hidden = self._run_layers(hidden, mask, done, layer)
+                    done = layer
+                    chunks[layer].append(hidden[:, 0, :].cpu().numpy())
+        
+        hidden_size = self.bert_model.config.hidden_size
+        return {
+            layer: np.vstack(parts) if parts else np.empty((0, hidden_size))
+            for layer, parts in chunks.items()
+        }
+    
+    def predict(self, complaint_text, return_embedding=False, finish_encoder=True):
         """
         Predict department and priority from complaint text
         
         Args:
             complaint_text (str): Customer complaint description
+            return_embedding (bool): Also return the final-layer CLS embedding
+                (np.ndarray, what EmbeddingStore holds)
+            finish_encoder (bool): When the heads use fewer layers, run the
+                rest of the encoder for that embedding. With False the
+                embedding is None unless an early-exit miss ran them anyway.
             
         Returns:
             dict: {
                 'department': str,
                 'priority': str,
+                'model_version': str,
+                'encoder_layers': int,
                 'success': bool
             }
         """
@@ -91,22 +233,49 @@ class TicketPredictor:
             # Step 1: Clean text (same as training)
             cleaned_text = self.clean_text(complaint_text)
             
-            # Step 2: Convert to BERT embedding
-            embedding = self.get_bert_embedding(cleaned_text)
+            # Step 2: BERT embedding after as many layers as this version of the heads needs
+            heads = self.heads
+            depth = self.encoder_depth(heads)
             
-            # Step 3: Predict department
-            dept_pred = self.dept_model.predict(embedding)[0]
-            department = self.dept_encoder.inverse_transform([dept_pred])[0]
+            with torch.no_grad():
+                hidden, mask = self._start_encoder(self._tokenize(cleaned_text))
+                hidden = self._run_layers(hidden, mask, 0, depth)
+            embedding = hidden[:, 0, :].cpu().numpy()
             
-            # Step 4: Predict priority
-            prio_pred = self.prio_model.predict(embedding)[0]
-            priority = self.prio_encoder.inverse_transform([prio_pred])[0]
+            # Step 3: Predict department and priority with that version of the heads
+            dept_proba = heads.dept_model.predict_proba(embedding)[0]
+            prio_proba = heads.prio_model.predict_proba(embedding)[0]
             
-            return {
+            # Early exit missed: unsure predictions finish the encoder and use the full-depth heads
+            confident = (self.fallback_heads is None
+                         or min(dept_proba.max(), prio_proba.max()) >= self.exit_threshold)
+            final_embedding = embedding if depth == self.num_layers else None
+            if depth < self.num_layers and ((return_embedding and finish_encoder) or not confident):
+                with torch.no_grad():
+                    hidden = self._run_layers(hidden, mask, depth, self.num_layers)
+                final_embedding = hidden[:, 0, :].cpu().numpy()
+                
+                if not confident:
+                    heads, depth = self.fallback_heads, self.num_layers
+                    dept_proba = heads.dept_model.predict_proba(final_embedding)[0]
+                    prio_proba = heads.prio_model.predict_proba(final_embedding)[0]
+            
+            dept_pred = heads.dept_model.classes_[dept_proba.argmax()]
+            department = heads.dept_encoder.inverse_transform([dept_pred])[0]
+            
+            prio_pred = heads.prio_model.classes_[prio_proba.argmax()]
+            priority = heads.prio_encoder.inverse_transform([prio_pred])[0]
+            
+            result = {
                 'department': department,
                 'priority': priority,
+                'model_version': heads.version,
+                'encoder_layers': depth,
                 'success': True
             }
+            if return_embedding:
+                result['embedding'] = None if final_embedding is None else final_embedding[0]
+            return result
             
         except Exception as e:
             print(f"⚠️ Prediction error: {e}")
@@ -117,11 +286,54 @@ class TicketPredictor:
                 'error': str(e)
             }
     
+    def embed_batch(self, complaint_texts, batch_size=32, layer=None):
+        """
+        Clean and embed many texts, batch_size texts per BERT forward pass
+        
+        Returns:
+            np.ndarray: one CLS embedding row per text (after `layer` layers)
+        """
+        cleaned = [self.clean_text(text) for text in complaint_texts]
+        chunks = [
+            self.get_bert_embedding(cleaned[i:i + batch_size], layer=layer)
+            for i in range(0, len(cleaned), batch_size)
+        ]
+        return np.vstack(chunks) if chunks else np.empty((0, self.bert_model.config.hidden_size))
+    
+    def predict_from_embeddings(self, embeddings, heads=None):
+        """
+        Predict department and priority for precomputed embeddings
+        (taken after encoder_depth(heads) layers)
+        
+        Returns:
+            list: [{'department': str, 'priority': str, 'model_version': str}, ...]
+        """
+        if len(embeddings) == 0:
+            return []
+        
+        heads = heads or self.heads
+        departments = heads.dept_encoder.inverse_transform(heads.dept_model.predict(embeddings))
+        priorities = heads.prio_encoder.inverse_transform(heads.prio_model.predict(embeddings))
+        
+        return [
+            {'department': department, 'priority': priority, 'model_version': heads.version}
+            for department, priority in zip(departments, priorities)
+        ]
+    
+    def predict_batch(self, complaint_texts, batch_size=32):
+        """Batched version of predict() for offline jobs (errors are raised, no early exit)"""
+        heads = self.heads
+        embeddings = self.embed_batch(complaint_texts, batch_size, self.encoder_depth(heads))
+        return self.predict_from_embeddings(embeddings, heads)
+    
     def get_available_categories(self):
         """Return all possible departments and priorities"""
+        heads = self.heads
         return {
-            'departments': self.departments,
-            'priorities': self.priorities
+            'departments': heads.departments,
+            'priorities': heads.priorities,
+            'model_version': heads.version,
+            'encoder_layers': self.encoder_depth(heads)
         }
 
 
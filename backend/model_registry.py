@@ -0,0 +1,125 @@
+import shutil
+import joblib
+import json
+import os
+
+
+# Files that make up one version of the classifier heads
+HEAD_FILES = ['dept_model.pkl', 'dept_encoder.pkl', 'prio_model.pkl', 'prio_encoder.pkl']
+
+# Optional: {"layer": k, ...} for heads trained on the CLS vector after BERT
+# layer k (train_layers.py). Without it the heads use the full encoder.
+ENCODER_FILE = 'encoder.json'
+
+# Version name for the pickles that sit directly in models/
+LEGACY_VERSION = 'legacy'
+
+
+class ClassifierHeads:
+    """
+    One loaded version of the department and priority classifiers
+    Swapped as a whole so a prediction never mixes two versions
+    """
+
+    def __init__(self, version, models_dir):
+        self.version = version
+        self.dept_model = joblib.load(os.path.join(models_dir, 'dept_model.pkl'))
+        self.dept_encoder = joblib.load(os.path.join(models_dir, 'dept_encoder.pkl'))
+        self.prio_model = joblib.load(os.path.join(models_dir, 'prio_model.pkl'))
+        self.prio_encoder = joblib.load(os.path.join(models_dir, 'prio_encoder.pkl'))
+
+        self.departments = self.dept_encoder.classes_.tolist()
+        self.priorities = self.prio_encoder.classes_.tolist()
+
+        encoder_path = os.path.join(models_dir, ENCODER_FILE)
+        self.encoder = {}
+        if os.path.exists(encoder_path):
+            with open(encoder_path) as f:
+                self.encoder = json.load(f)
+
+        # Encoder layers whose CLS output the heads expect (None = all of them)
+        self.layer = self.encoder.get('layer')
+
+
+class ModelRegistry:
+    """
+    Versioned classifier heads on disk
+
+        models/registry/<version>/dept_model.pkl ...
+        models/registry/CURRENT      <- name of the active version
+
+    Without a registry the pickles in models/ are served as 'legacy'.
+    """
+
+    def __init__(self, models_dir='models'):
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        self.models_dir = os.path.join(base_dir, models_dir)
+        self.registry_dir = os.path.join(self.models_dir, 'registry')
+        self.current_file = os.path.join(self.registry_dir, 'CURRENT')
+
+    def version_dir(self, version):
+        """Directory holding the files of a version"""
+        if version == LEGACY_VERSION:
+            return self.models_dir
+        return os.path.join(self.registry_dir, version)
+
+    def list_versions(self):
+        """All complete versions, oldest first"""
+        versions = [LEGACY_VERSION]
+        if os.path.isdir(self.registry_dir):
+            versions += sorted(
+                name for name in os.listdir(self.registry_dir)
+                if not name.endswith('.tmp')
+                and all(os.path.exists(os.path.join(self.registry_dir, name, f)) for f in HEAD_FILES)
+            )
+        return versions
+
+    def current_version(self):
+        """Name of the active version"""
+        try:
+            with open(self.current_file) as f:
+                return f.read().strip() or LEGACY_VERSION
+        except FileNotFoundError:
+            return LEGACY_VERSION
+
+    def set_current(self, version):
+        """Make a version active (atomic rename, picked up by every worker)"""
+        if version not in self.list_versions():
+            raise ValueError(f'Unknown model version: {version}')
+
+        os.makedirs(self.registry_dir, exist_ok=True)
+        tmp_file = self.current_file + '.tmp'
+        with open(tmp_file, 'w') as f:
+            f.write(version)
+        os.replace(tmp_file, self.current_file)
+
+    def encoder_info(self, version):
+        """Contents of a version's encoder.json ({} for full-depth heads)"""
+        path = os.path.join(self.version_dir(version), ENCODER_FILE)
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    def load(self, version):
+        """Load the heads of a version"""
+        if version not in self.list_versions():
+            raise ValueError(f'Unknown model version: {version}')
+        return ClassifierHeads(version, self.version_dir(version))
+
+    def publish(self, version, source_dir):
+        """Copy freshly trained pickles from source_dir in as a new version"""
+        if version == LEGACY_VERSION or version in self.list_versions():
+            raise ValueError(f'Model version already exists: {version}')
+
+        target_dir = self.version_dir(version)
+        tmp_dir = target_dir + '.tmp'
+        os.makedirs(tmp_dir, exist_ok=True)
+        for name in HEAD_FILES + [ENCODER_FILE]:
+            if name == ENCODER_FILE and not os.path.exists(os.path.join(source_dir, name)):
+                continue
+            shutil.copy2(os.path.join(source_dir, name), os.path.join(tmp_dir, name))
+
+        # Only complete directories count as versions
+        os.replace(tmp_dir, target_dir)
+        return target_dir
@@ -1,7 +1,89 @@
+from contextlib import contextmanager
 from datetime import datetime
 import sqlite3
 import os
 
+
+# Admin listings (streamed by app.py, timed by benchmark.py)
+ADMIN_USER_COLUMNS = ['id', 'name', 'email', 'created_at', 'ticket_count']
+
+ADMIN_TICKET_COLUMNS = [
+    'id', 'ticket_number', 'title', 'description', 'category', 'priority',
+    'status', 'user_id', 'user_name', 'user_email', 'created_at', 'updated_at'
+]
+
+ADMIN_USERS_QUERY = '''
+    SELECT u.id, u.name, u.email, u.created_at, COUNT(t.id) as ticket_count
+    FROM users u
+    LEFT JOIN tickets t ON u.id = t.user_id
+    GROUP BY u.id
+    ORDER BY u.created_at DESC
+'''
+
+ADMIN_TICKETS_QUERY = '''
+    SELECT t.*, u.name as user_name, u.email as user_email
+    FROM tickets t
+    LEFT JOIN users u ON t.user_id = u.id
+    ORDER BY t.created_at DESC
+'''
+
+# Public ticket fields. Queries list them instead of SELECT *, which would
+# also return the generated priority_rank sort key.
+TICKET_COLUMNS = [
+    'id', 'ticket_number', 'user_id', 'title', 'description',
+    'category', 'priority', 'status', 'created_at', 'updated_at'
+]
+TICKET_SELECT = ', '.join(TICKET_COLUMNS)
+
+# Work queue order: most urgent first, then oldest. priority_rank is a
+# generated column so it can never disagree with priority.
+PRIORITY_RANKS = {'Critical': 0, 'High': 1, 'Medium': 2, 'Low': 3}
+PRIORITY_RANK_SQL = 'CASE priority {} ELSE {} END'.format(
+    ' '.join(f"WHEN '{name}' THEN {rank}" for name, rank in PRIORITY_RANKS.items()),
+    len(PRIORITY_RANKS)
+)
+
+# Time-series rollups (maintained here, queried by analytics.py)
+ROLLUP_BUCKETS = ('hour', 'day')
+ROLLUP_COLUMNS = ['created', 'closed', 'close_seconds', 'backlog']
+
+# SQL equivalent of rollup_period, for rebuilding rollups in bulk
+ROLLUP_PERIOD_SQL = {
+    'hour': "substr({column}, 1, 13) || ':00:00'",
+    'day': "substr({column}, 1, 10)",
+}
+
+
+def rollup_period(bucket, timestamp):
+    """'2024-05-01 13:45:10' -> '2024-05-01 13:00:00' (hour) or '2024-05-01' (day)"""
+    if bucket == 'hour':
+        return timestamp[:13] + ':00:00'
+    return timestamp[:10]
+
+
+def rollup_rows(ticket, sign=1):
+    """
+    Rollup deltas for a ticket in its current state: created (and added to the
+    backlog) at created_at, and closed (removed from the backlog) at
+    updated_at when its status is Closed. sign=-1 takes them back out.
+    """
+    rows = []
+    category, priority = ticket['category'], ticket['priority']
+    close_seconds = None
+    if ticket['status'] == 'Closed':
+        created = datetime.strptime(ticket['created_at'], '%Y-%m-%d %H:%M:%S')
+        closed = datetime.strptime(ticket['updated_at'], '%Y-%m-%d %H:%M:%S')
+        close_seconds = int((closed - created).total_seconds())
+
+    for bucket in ROLLUP_BUCKETS:
+        rows.append((bucket, rollup_period(bucket, ticket['created_at']), category, priority,
+                     sign, 0, 0, sign))
+        if close_seconds is not None:
+            rows.append((bucket, rollup_period(bucket, ticket['updated_at']), category, priority,
+                         0, sign, sign * close_seconds, -sign))
+    return rows
+
+
 class Database:
     """
     Simple database handler for tickets and users
@@ -14,6 +96,10 @@ class Database:
         base_dir = os.path.dirname(os.path.abspath(__file__))
         self.db_path = os.path.join(base_dir, db_path)
         
+        # Optional AuditBuffer: history/activity rows are then written
+        # behind the request instead of inside its transaction
+        self.audit_buffer = None
+        
         # Ensure database directory exists
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
         
@@ -22,15 +108,46 @@ class Database:
     
     def get_connection(self):
         """Get database connection"""
-        conn = sqlite3.connect(self.db_path)
+        # Writers queue on the lock for up to 30s instead of failing after 5s
+        conn = sqlite3.connect(self.db_path, timeout=30)
         conn.row_factory = sqlite3.Row  # Return rows as dictionaries
         return conn
     
+    @contextmanager
+    def write_transaction(self, attach=None):
+        """
+        Cursor inside BEGIN IMMEDIATE, committed on success
+        The write lock is taken before the first read, so read-then-write
+        paths (ticket numbers, rollup snapshots) can't interleave with other
+        writers. The default deferred transaction only locks at the first
+        write, after the reads.
+        attach maps schema names to other database files to ATTACH first
+        (SQLite refuses ATTACH inside a transaction).
+        """
+        conn = self.get_connection()
+        conn.isolation_level = None  # transaction managed by hand
+        for name, path in (attach or {}).items():
+            conn.execute(f'ATTACH DATABASE ? AS {name}', (path,))
+        cursor = conn.cursor()
+        try:
+            cursor.execute('BEGIN IMMEDIATE')
+            yield cursor
+            cursor.execute('COMMIT')
+        except BaseException:
+            if conn.in_transaction:
+                cursor.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+    
     def create_tables(self):
         """Create all database tables"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
+        # WAL lets readers carry on while one request writes (persists in the file)
+        cursor.execute('PRAGMA journal_mode=WAL')
+        
         # Users table
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS users (
@@ -85,10 +202,144 @@ class Database:
             )
         ''')
         
+        # Priority rank + index behind claim_next_ticket (added to older databases too)
+        cursor.execute('PRAGMA table_xinfo(tickets)')
+        if 'priority_rank' not in [column['name'] for column in cursor.fetchall()]:
+            cursor.execute(f'''
+                ALTER TABLE tickets ADD COLUMN priority_rank INTEGER
+                GENERATED ALWAYS AS ({PRIORITY_RANK_SQL}) VIRTUAL
+            ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_tickets_queue
+            ON tickets (category, status, priority_rank, created_at)
+        ''')
+        
+        # Ticket rollups: per hour and per day, by department and priority
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS ticket_rollups (
+                bucket TEXT NOT NULL,
+                period TEXT NOT NULL,
+                category TEXT NOT NULL,
+                priority TEXT NOT NULL,
+                created INTEGER NOT NULL DEFAULT 0,
+                closed INTEGER NOT NULL DEFAULT 0,
+                close_seconds INTEGER NOT NULL DEFAULT 0,
+                backlog INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (bucket, period, category, priority)
+            ) WITHOUT ROWID
+        ''')
+        
+        # Tickets from before the rollups existed: without their rows, later
+        # updates would subtract counts that were never added
+        cursor.execute('SELECT EXISTS (SELECT 1 FROM tickets) AND NOT EXISTS (SELECT 1 FROM ticket_rollups)')
+        if cursor.fetchone()[0]:
+            print("📊 Building ticket rollups for existing tickets...")
+            self.rebuild_rollups(cursor)
+        
         conn.commit()
         conn.close()
         print("✅ Database tables created successfully")
     
+    # AUDIT ROWS (ticket_history / activities)
+    
+    @staticmethod
+    def now():
+        """Current time in the same format as SQLite's CURRENT_TIMESTAMP"""
+        return datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+    
+    @staticmethod
+    def insert_history_rows(cursor, rows):
+        """Insert (ticket_id, action, changed_by, timestamp) rows"""
+        if rows:
+            cursor.executemany('''
+                INSERT INTO ticket_history (ticket_id, action, changed_by, timestamp)
+                VALUES (?, ?, ?, ?)
+            ''', rows)
+    
+    @staticmethod
+    def insert_activity_rows(cursor, rows):
+        """Insert (user_id, activity_type, description, timestamp) rows"""
+        if rows:
+            cursor.executemany('''
+                INSERT INTO activities (user_id, activity_type, description, timestamp)
+                VALUES (?, ?, ?, ?)
+            ''', rows)
+    
+    def _write_audit(self, cursor, history=(), activities=()):
+        """Insert audit rows in the caller's transaction, unless they are buffered"""
+        if self.audit_buffer is None:
+            self.insert_history_rows(cursor, history)
+            self.insert_activity_rows(cursor, activities)
+    
+    def _queue_audit(self, history=(), activities=()):
+        """Hand audit rows to the buffer after the caller's transaction committed"""
+        if self.audit_buffer is not None:
+            self.audit_buffer.add(history, activities)
+    
+    # ROLLUPS
+    
+    @staticmethod
+    def _rollup_snapshots(cursor, where, params):
+        """Fields rollup_rows() needs, for the tickets matching a WHERE clause"""
+        cursor.execute(f'''
+            SELECT id, category, priority, status, created_at, updated_at
+            FROM tickets WHERE {where}
+        ''', params)
+        return [dict(row) for row in cursor.fetchall()]
+    
+    @staticmethod
+    def rebuild_rollups(cursor, sources=('main.tickets',)):
+        """
+        Replace every rollup row with totals recomputed from the ticket
+        tables in `sources` (in the caller's transaction)
+        
+        Returns:
+            int: rollup rows written
+        """
+        cursor.execute('DELETE FROM ticket_rollups')
+        
+        for bucket in ROLLUP_BUCKETS:
+            created_period = ROLLUP_PERIOD_SQL[bucket].format(column='created_at')
+            closed_period = ROLLUP_PERIOD_SQL[bucket].format(column='updated_at')
+            events = ' UNION ALL '.join(f'''
+                SELECT {created_period} AS period, category, priority,
+                       1 AS created, 0 AS closed, 0 AS close_seconds, 1 AS backlog
+                FROM {source}
+                UNION ALL
+                SELECT {closed_period}, category, priority, 0, 1,
+                       CAST(strftime('%s', updated_at) AS INTEGER) - CAST(strftime('%s', created_at) AS INTEGER),
+                       -1
+                FROM {source} WHERE status = 'Closed'
+            ''' for source in sources)
+            
+            cursor.execute(f'''
+                INSERT INTO ticket_rollups
+                    (bucket, period, category, priority, created, closed, close_seconds, backlog)
+                SELECT ?, period, category, priority,
+                       SUM(created), SUM(closed), SUM(close_seconds), SUM(backlog)
+                FROM ({events})
+                GROUP BY period, category, priority
+            ''', (bucket,))
+        
+        cursor.execute('SELECT COUNT(*) FROM ticket_rollups')
+        return cursor.fetchone()[0]
+    
+    @staticmethod
+    def _update_rollups(cursor, old=(), new=()):
+        """Take old ticket states out of the rollups and put new ones in"""
+        rows = [row for ticket in old for row in rollup_rows(ticket, -1)]
+        rows += [row for ticket in new for row in rollup_rows(ticket)]
+        cursor.executemany('''
+            INSERT INTO ticket_rollups
+                (bucket, period, category, priority, created, closed, close_seconds, backlog)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (bucket, period, category, priority) DO UPDATE SET
+                created = created + excluded.created,
+                closed = closed + excluded.closed,
+                close_seconds = close_seconds + excluded.close_seconds,
+                backlog = backlog + excluded.backlog
+        ''', rows)
+    
     # USER OPERATIONS
     
     def create_user(self, email, password, name):
@@ -127,40 +378,46 @@ class Database:
         conn.close()
         return dict(user) if user else None
     
+    def update_user_password(self, user_id, password):
+        """Replace a user's password hash"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('UPDATE users SET password = ? WHERE id = ?', (password, user_id))
+        conn.commit()
+        conn.close()
+    
     # TICKET OPERATIONS
     
     def create_ticket(self, user_id, title, description, category, priority):
         """Create a new ticket"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # Generate ticket number
-        cursor.execute('SELECT COUNT(*) as count FROM tickets')
-        count = cursor.fetchone()['count']
-        ticket_number = f"TKT-{count + 1:05d}"
-        
-        # Insert ticket
-        cursor.execute('''
-            INSERT INTO tickets (ticket_number, user_id, title, description, category, priority)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (ticket_number, user_id, title, description, category, priority))
-        
-        ticket_id = cursor.lastrowid
-        
-        # Add to history
-        cursor.execute('''
-            INSERT INTO ticket_history (ticket_id, action, changed_by)
-            VALUES (?, 'Created', ?)
-        ''', (ticket_id, user_id))
-        
-        # Add activity
-        cursor.execute('''
-            INSERT INTO activities (user_id, activity_type, description)
-            VALUES (?, 'ticket_created', ?)
-        ''', (user_id, f'Created ticket {ticket_number}'))
+        with self.write_transaction() as cursor:
+            # Generate ticket number from the AUTOINCREMENT sequence so numbers
+            # stay unique after tickets are deleted or moved to the archive
+            cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'tickets'")
+            row = cursor.fetchone()
+            count = row['seq'] if row else 0
+            ticket_number = f"TKT-{count + 1:05d}"
+            
+            # Insert ticket
+            now = self.now()
+            cursor.execute('''
+                INSERT INTO tickets (ticket_number, user_id, title, description, category, priority,
+                                     created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (ticket_number, user_id, title, description, category, priority, now, now))
+            
+            ticket_id = cursor.lastrowid
+            self._update_rollups(cursor, new=[{
+                'category': category, 'priority': priority, 'status': 'Open',
+                'created_at': now, 'updated_at': now
+            }])
+            
+            # Add to history and activity
+            history = [(ticket_id, 'Created', user_id, now)]
+            activities = [(user_id, 'ticket_created', f'Created ticket {ticket_number}', now)]
+            self._write_audit(cursor, history, activities)
         
-        conn.commit()
-        conn.close()
+        self._queue_audit(history, activities)
         
         return {
             'id': ticket_id,
@@ -173,14 +430,14 @@ class Database:
         cursor = conn.cursor()
         
         if status:
-            cursor.execute('''
-                SELECT * FROM tickets 
+            cursor.execute(f'''
+                SELECT {TICKET_SELECT} FROM tickets 
                 WHERE user_id = ? AND status = ?
                 ORDER BY created_at DESC
             ''', (user_id, status))
         else:
-            cursor.execute('''
-                SELECT * FROM tickets 
+            cursor.execute(f'''
+                SELECT {TICKET_SELECT} FROM tickets 
                 WHERE user_id = ?
                 ORDER BY created_at DESC
             ''', (user_id,))
@@ -194,35 +451,178 @@ class Database:
         """Get a single ticket by ID"""
         conn = self.get_connection()
         cursor = conn.cursor()
-        cursor.execute('SELECT * FROM tickets WHERE id = ?', (ticket_id,))
+        cursor.execute(f'SELECT {TICKET_SELECT} FROM tickets WHERE id = ?', (ticket_id,))
         ticket = cursor.fetchone()
         conn.close()
         return dict(ticket) if ticket else None
     
     def update_ticket_status(self, ticket_id, status, user_id):
         """Update ticket status"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.write_transaction() as cursor:
+            now = self.now()
+            old = self._rollup_snapshots(cursor, 'id = ?', (ticket_id,))
+            cursor.execute('''
+                UPDATE tickets 
+                SET status = ?, updated_at = ?
+                WHERE id = ?
+            ''', (status, now, ticket_id))
+            self._update_rollups(cursor, old, [dict(t, status=status, updated_at=now) for t in old])
+            
+            # Add to history
+            history = [(ticket_id, f'Status changed to {status}', user_id, now)]
+            self._write_audit(cursor, history)
         
-        cursor.execute('''
-            UPDATE tickets 
-            SET status = ?, updated_at = CURRENT_TIMESTAMP
-            WHERE id = ?
-        ''', (status, ticket_id))
+        self._queue_audit(history)
         
-        # Add to history
-        cursor.execute('''
-            INSERT INTO ticket_history (ticket_id, action, changed_by)
-            VALUES (?, ?, ?)
-        ''', (ticket_id, f'Status changed to {status}', user_id))
+        return True
+    
+    def claim_next_ticket(self, category, agent_id=0):
+        """
+        Take the most urgent, oldest open ticket of a department and mark it
+        In Progress. The write transaction holds the lock from the lookup to
+        the update, so concurrent claims never get the same ticket.
+        
+        Returns:
+            dict: the claimed ticket, or None when the queue is empty
+        """
+        with self.write_transaction() as cursor:
+            cursor.execute(f'''
+                SELECT {TICKET_SELECT} FROM tickets
+                WHERE category = ? AND status = 'Open'
+                ORDER BY priority_rank, created_at, id
+                LIMIT 1
+            ''', (category,))
+            ticket = cursor.fetchone()
+            if ticket is None:
+                return None
+            
+            # Open -> In Progress leaves the rollups unchanged (only closing counts)
+            now = self.now()
+            cursor.execute('''
+                UPDATE tickets SET status = 'In Progress', updated_at = ?
+                WHERE id = ?
+            ''', (now, ticket['id']))
+            
+            history = [(ticket['id'], 'Status changed to In Progress', agent_id, now)]
+            self._write_audit(cursor, history)
+        
+        self._queue_audit(history)
+        return dict(ticket, status='In Progress', updated_at=now)
+    
+    def add_ticket_history(self, ticket_id, action, changed_by):
+        """Record a single ticket history entry"""
+        history = [(ticket_id, action, changed_by, self.now())]
+        if self.audit_buffer is not None:
+            self.audit_buffer.add(history)
+            return
         
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        self.insert_history_rows(cursor, history)
         conn.commit()
         conn.close()
+    
+    def get_tickets_after(self, last_id, limit, shard=0, shards=1):
+        """
+        Get the next chunk of tickets with id > last_id, in id order.
+        With shards > 1 only tickets where id % shards == shard are returned.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT id, description, category, priority FROM tickets
+            WHERE id > ? AND id % ? = ?
+            ORDER BY id
+            LIMIT ?
+        ''', (last_id, shards, shard, limit))
         
-        return True
+        tickets = cursor.fetchall()
+        conn.close()
+        
+        return [dict(ticket) for ticket in tickets]
+    
+    def bulk_reclassify(self, changes, changed_by, model_version=None):
+        """
+        Apply many category/priority changes in one transaction
+        
+        Args:
+            changes (list): [{'id', 'old_category', 'old_priority', 'category', 'priority'}, ...]
+            changed_by (int): user recorded in ticket_history (0 = system)
+            model_version (str): classifier version noted in ticket_history
+        """
+        label = f'Reclassified by model {model_version}' if model_version else 'Reclassified'
+        
+        if not changes:
+            return 0
+        
+        with self.write_transaction() as cursor:
+            old = []
+            for start in range(0, len(changes), 500):
+                ids = [c['id'] for c in changes[start:start + 500]]
+                old += self._rollup_snapshots(cursor, f"id IN ({','.join('?' * len(ids))})", ids)
+            
+            # updated_at is left alone: history pages treat it as the close date
+            cursor.executemany('''
+                UPDATE tickets
+                SET category = ?, priority = ?
+                WHERE id = ?
+            ''', [(c['category'], c['priority'], c['id']) for c in changes])
+            
+            by_id = {c['id']: c for c in changes}
+            self._update_rollups(cursor, old, [
+                dict(t, category=by_id[t['id']]['category'], priority=by_id[t['id']]['priority'])
+                for t in old
+            ])
+            
+            now = self.now()
+            history = [(
+                c['id'],
+                f"{label}: {c['old_category']}/{c['old_priority']} → {c['category']}/{c['priority']}",
+                changed_by,
+                now
+            ) for c in changes]
+            self._write_audit(cursor, history)
+        
+        self._queue_audit(history)
+        
+        return len(changes)
+    
+    # ADMIN OPERATIONS
+    
+    def admin_update_ticket(self, ticket_id, category, priority, status):
+        """Overwrite a ticket's department, priority and status"""
+        with self.write_transaction() as cursor:
+            now = self.now()
+            old = self._rollup_snapshots(cursor, 'id = ?', (ticket_id,))
+            cursor.execute('''
+                UPDATE tickets 
+                SET category = ?, priority = ?, status = ?, updated_at = ?
+                WHERE id = ?
+            ''', (category, priority, status, now, ticket_id))
+            self._update_rollups(cursor, old, [
+                dict(t, category=category, priority=priority, status=status, updated_at=now) for t in old
+            ])
+    
+    def delete_ticket(self, ticket_id):
+        """Delete a ticket"""
+        with self.write_transaction() as cursor:
+            self._update_rollups(cursor, old=self._rollup_snapshots(cursor, 'id = ?', (ticket_id,)))
+            cursor.execute('DELETE FROM tickets WHERE id = ?', (ticket_id,))
+    
+    def delete_user(self, user_id):
+        """Delete a user and all their tickets"""
+        with self.write_transaction() as cursor:
+            # Delete user's tickets first
+            self._update_rollups(cursor, old=self._rollup_snapshots(cursor, 'user_id = ?', (user_id,)))
+            cursor.execute('DELETE FROM tickets WHERE user_id = ?', (user_id,))
+            cursor.execute('DELETE FROM users WHERE id = ?', (user_id,))
     
     def get_recent_activities(self, user_id, limit=5):
-        """Get recent activities for a user"""
+        """Get recent activities for a user (including ones still in the audit buffer)"""
+        # Read the buffer first: a row flushed in between then shows up twice
+        # (dropped below) rather than not at all
+        pending = self.audit_buffer.pending_activities(user_id) if self.audit_buffer else []
+        
         conn = self.get_connection()
         cursor = conn.cursor()
         cursor.execute('''
@@ -232,10 +632,16 @@ class Database:
             LIMIT ?
         ''', (user_id, limit))
         
-        activities = cursor.fetchall()
+        activities = [dict(activity) for activity in cursor.fetchall()]
         conn.close()
         
-        return [dict(activity) for activity in activities]
+        if pending:
+            committed = {(a['activity_type'], a['description'], a['timestamp']) for a in activities}
+            pending = [a for a in pending
+                       if (a['activity_type'], a['description'], a['timestamp']) not in committed]
+            activities = sorted(pending + activities, key=lambda a: a['timestamp'], reverse=True)[:limit]
+        
+        return activities
 
 
 # Test database if this file is run directly
@@ -0,0 +1,208 @@
+import threading
+import sqlite3
+import time
+import os
+
+
+def parse_rate(value):
+    """Turn 'N/S' (N requests per S seconds) into (capacity, tokens per second)"""
+    count, seconds = value.split('/')
+    capacity = float(count)
+    return capacity, capacity / float(seconds)
+
+
+class MemoryBucketStore:
+    """Token buckets kept in this process only (single worker setups)"""
+
+    def __init__(self):
+        self._buckets = {}
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate, cost=1.0):
+        """
+        Refill the bucket for elapsed time, then try to take `cost` tokens
+
+        Returns:
+            float: 0 if allowed, otherwise seconds until enough tokens exist
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+
+            if tokens >= cost:
+                self._buckets[key] = (tokens - cost, now)
+                return 0.0
+
+            self._buckets[key] = (tokens, now)
+            return (cost - tokens) / rate
+
+    def add_in_flight(self, key, delta):
+        """Change the number of calls in flight for `key`"""
+        with self._lock:
+            self._in_flight[key] = self._in_flight.get(key, 0) + delta
+
+    def in_flight(self, key):
+        """Calls in flight for `key` in this process"""
+        return self._in_flight.get(key, 0)
+
+
+class SQLiteBucketStore:
+    """Token buckets in a SQLite file, shared by every worker on the host"""
+
+    # In-flight counts of a worker that has not touched them for this long
+    # are ignored (the worker died, or one call hung)
+    IN_FLIGHT_TTL = 60
+
+    def __init__(self, db_path='database/rate_limits.db'):
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        self.db_path = os.path.join(base_dir, db_path)
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+
+        conn = self.get_connection()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS buckets (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL
+            )
+        ''')
+        # One row per worker process, so a crashed worker's calls age out
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS in_flight (
+                key TEXT NOT NULL,
+                pid INTEGER NOT NULL,
+                count INTEGER NOT NULL,
+                updated REAL NOT NULL,
+                PRIMARY KEY (key, pid)
+            )
+        ''')
+        # A restarted worker may reuse the pid of one that died mid-call
+        conn.execute('DELETE FROM in_flight WHERE pid = ?', (os.getpid(),))
+        conn.commit()
+        conn.close()
+
+    def get_connection(self):
+        conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def take(self, key, capacity, rate, cost=1.0):
+        """Same as MemoryBucketStore.take, serialized across processes"""
+        # Wall clock: monotonic clocks are not comparable between processes
+        now = time.time()
+        conn = self.get_connection()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT tokens, updated FROM buckets WHERE key = ?', (key,)).fetchone()
+            tokens, updated = row if row else (capacity, now)
+            tokens = min(capacity, tokens + max(now - updated, 0) * rate)
+
+            wait = 0.0
+            if tokens >= cost:
+                tokens -= cost
+            else:
+                wait = (cost - tokens) / rate
+
+            conn.execute('''
+                INSERT INTO buckets (key, tokens, updated) VALUES (?, ?, ?)
+                ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated
+            ''', (key, tokens, now))
+            conn.execute('COMMIT')
+            return wait
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def add_in_flight(self, key, delta):
+        """Change this worker's number of calls in flight for `key`"""
+        conn = self.get_connection()
+        try:
+            conn.execute('''
+                INSERT INTO in_flight (key, pid, count, updated) VALUES (?, ?, MAX(?, 0), ?)
+                ON CONFLICT(key, pid) DO UPDATE SET count = MAX(count + ?, 0), updated = excluded.updated
+            ''', (key, os.getpid(), delta, time.time(), delta))
+        finally:
+            conn.close()
+
+    def in_flight(self, key):
+        """Calls in flight for `key` across every worker on the host"""
+        conn = self.get_connection()
+        try:
+            row = conn.execute(
+                'SELECT COALESCE(SUM(count), 0) FROM in_flight WHERE key = ? AND updated > ?',
+                (key, time.time() - self.IN_FLIGHT_TTL)
+            ).fetchone()
+            return row[0]
+        finally:
+            conn.close()
+
+
+class RateLimiter:
+    """
+    Per-identity, per-endpoint token buckets
+
+        limiter = RateLimiter(MemoryBucketStore(), {'preview': '20/60', 'create': '5/60'})
+        wait = limiter.check(user_id, 'preview')   # 0 when allowed
+    """
+
+    def __init__(self, store, limits):
+        self.store = store
+        self.limits = {endpoint: parse_rate(rate) for endpoint, rate in limits.items()}
+
+    def check(self, identity, endpoint):
+        """Take one token; return 0 if allowed, else seconds to wait"""
+        if endpoint not in self.limits:
+            return 0.0
+        capacity, rate = self.limits[endpoint]
+        return self.store.take(f'{endpoint}:{identity}', capacity, rate)
+
+
+class InferenceGate:
+    """
+    Counts BERT calls in flight so cheap-to-drop work (live previews) can be
+    shed first when the model is saturated
+
+    The count lives in the bucket store: with SQLiteBucketStore it covers
+    every worker on the host. MemoryBucketStore only sees its own process,
+    and a sync gunicorn worker never has more than one call in flight, so
+    there it only sheds under the threaded/ASGI servers.
+    """
+
+    KEY = 'inference'
+
+    def __init__(self, max_in_flight, store=None):
+        self.max_in_flight = max_in_flight
+        self.store = store if store is not None else MemoryBucketStore()
+
+    @property
+    def in_flight(self):
+        return self.store.in_flight(self.KEY)
+
+    def overloaded(self):
+        return self.in_flight >= self.max_in_flight
+
+    def __enter__(self):
+        self.store.add_in_flight(self.KEY, 1)
+        return self
+
+    def __exit__(self, *exc):
+        self.store.add_in_flight(self.KEY, -1)
+        return False
+
+
+def create_rate_limiter():
+    """Build the limiter from RATE_LIMIT_* environment variables"""
+    if os.environ.get('RATE_LIMIT_BACKEND', 'memory') == 'sqlite':
+        store = SQLiteBucketStore()
+    else:
+        store = MemoryBucketStore()
+
+    return RateLimiter(store, {
+        'preview': os.environ.get('RATE_LIMIT_PREVIEW', '20/60'),
+        'create': os.environ.get('RATE_LIMIT_CREATE', '10/60')
+    })
@@ -0,0 +1,154 @@
+"""
+Re-score existing tickets after dept_model.pkl / prio_model.pkl are retrained
+
+    python reclassify.py                  # single process
+    python reclassify.py --workers 4      # split tickets across 4 processes
+    python reclassify.py --dry-run        # only report what would change
+
+Progress is checkpointed per worker, so an interrupted run picks up where
+it stopped. Use --restart to ignore existing checkpoints.
+"""
+from multiprocessing import Process
+import argparse
+import json
+import time
+import os
+
+import numpy as np
+
+from models import Database
+from embedding_store import EmbeddingStore
+
+
+CHECKPOINT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'database', 'reclassify')
+
+
+def checkpoint_path(shard, shards):
+    """Checkpoint file for one worker"""
+    return os.path.join(CHECKPOINT_DIR, f'shard-{shard}-of-{shards}.json')
+
+
+def load_checkpoint(shard, shards):
+    """Return the last ticket id this worker finished, or 0"""
+    try:
+        with open(checkpoint_path(shard, shards)) as f:
+            return json.load(f)['last_id']
+    except (FileNotFoundError, KeyError, ValueError):
+        return 0
+
+
+def save_checkpoint(shard, shards, last_id, stats):
+    """Atomically record progress for one worker"""
+    os.makedirs(CHECKPOINT_DIR, exist_ok=True)
+    path = checkpoint_path(shard, shards)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'last_id': last_id, **stats}, f)
+    os.replace(tmp_path, path)
+
+
+def run_shard(shard, shards, chunk_size=256, batch_size=32, changed_by=0,
+              dry_run=False, restart=False):
+    """Reclassify every ticket with id % shards == shard"""
+    # Imported here so each worker process loads its own copy of BERT
+    from ml_predictor import TicketPredictor
+
+    db = Database()
+    predictor = TicketPredictor()
+    store = EmbeddingStore(dim=predictor.bert_model.config.hidden_size)
+
+    # One version of the heads for the whole run
+    heads = predictor.heads
+    depth = predictor.encoder_depth(heads)
+
+    last_id = 0 if restart else load_checkpoint(shard, shards)
+    stats = {'processed': 0, 'changed': 0, 'cached': 0}
+    started = time.time()
+
+    print(f"🔄 Worker {shard + 1}/{shards} starting after ticket #{last_id}")
+
+    while True:
+        tickets = db.get_tickets_after(last_id, chunk_size, shard, shards)
+        if not tickets:
+            break
+
+        # Reuse stored (final-layer) embeddings when the heads use the full
+        # encoder; only tickets without one go through BERT
+        cached = store.get_many([ticket['id'] for ticket in tickets]) if depth == predictor.num_layers else {}
+        missing = [ticket for ticket in tickets if ticket['id'] not in cached]
+        if missing:
+            fresh = predictor.embed_batch([ticket['description'] for ticket in missing], batch_size, depth)
+            cached.update({ticket['id']: vector for ticket, vector in zip(missing, fresh)})
+        stats['cached'] += len(tickets) - len(missing)
+
+        predictions = predictor.predict_from_embeddings(
+            np.vstack([cached[ticket['id']] for ticket in tickets]), heads
+        )
+
+        changes = []
+        for ticket, prediction in zip(tickets, predictions):
+            if (ticket['category'], ticket['priority']) != (prediction['department'], prediction['priority']):
+                changes.append({
+                    'id': ticket['id'],
+                    'old_category': ticket['category'],
+                    'old_priority': ticket['priority'],
+                    'category': prediction['department'],
+                    'priority': prediction['priority']
+                })
+
+        if not dry_run:
+            db.bulk_reclassify(changes, changed_by, heads.version)
+
+        last_id = tickets[-1]['id']
+        stats['processed'] += len(tickets)
+        stats['changed'] += len(changes)
+
+        if not dry_run:
+            save_checkpoint(shard, shards, last_id, stats)
+
+        elapsed = time.time() - started
+        print(f"   Worker {shard + 1}/{shards}: {stats['processed']} processed, "
+              f"{stats['changed']} changed, {stats['processed'] / elapsed:.1f} tickets/sec")
+
+    elapsed = time.time() - started
+    rate = stats['processed'] / elapsed if elapsed else 0.0
+    print(f"✅ Worker {shard + 1}/{shards} done: {stats['processed']} processed, "
+          f"{stats['changed']} changed, {stats['cached']} cached embeddings in {elapsed:.1f}s ({rate:.1f} tickets/sec)")
+
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Re-score tickets with the current models')
+    parser.add_argument('--workers', type=int, default=1, help='Number of worker processes')
+    parser.add_argument('--chunk-size', type=int, default=256, help='Tickets read and written per transaction')
+    parser.add_argument('--batch-size', type=int, default=32, help='Texts per BERT forward pass')
+    parser.add_argument('--changed-by', type=int, default=0, help='User id recorded in ticket history (0 = system)')
+    parser.add_argument('--dry-run', action='store_true', help='Report changes without writing them')
+    parser.add_argument('--restart', action='store_true', help='Ignore existing checkpoints')
+    args = parser.parse_args()
+
+    options = {
+        'chunk_size': args.chunk_size,
+        'batch_size': args.batch_size,
+        'changed_by': args.changed_by,
+        'dry_run': args.dry_run,
+        'restart': args.restart
+    }
+
+    print(f"\n🤖 Reclassifying tickets with {args.workers} worker(s)...\n")
+    started = time.time()
+
+    if args.workers == 1:
+        run_shard(0, 1, **options)
+    else:
+        workers = [
+            Process(target=run_shard, args=(shard, args.workers), kwargs=options)
+            for shard in range(args.workers)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+    print(f"\n✅ Reclassification finished in {time.time() - started:.1f}s\n")
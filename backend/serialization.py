@@ -0,0 +1,116 @@
+from flask.json.provider import DefaultJSONProvider
+import json
+import gzip
+import zlib
+
+# Optional fast paths: orjson for encoding, brotli for compression
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def dumps(obj):
+    """Encode to a JSON string, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY).decode('utf-8')
+    return json.dumps(obj, separators=(',', ':'))
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider (jsonify, request.get_json) backed by dumps() above"""
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None:
+            try:
+                return dumps(obj)
+            except TypeError:
+                # Types orjson doesn't know (e.g. Decimal) use Flask's defaults
+                pass
+        return super().dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+
+def compact_rows(rows, columns):
+    """List of dicts -> {'columns': [...], 'rows': [[...], ...]} (names sent once)"""
+    return {
+        'columns': columns,
+        'rows': [[row.get(column) for column in columns] for row in rows]
+    }
+
+
+# RESPONSE COMPRESSION
+
+def choose_encoding(accept_encoding):
+    """Best encoding this server supports from an Accept-Encoding header"""
+    offered = {
+        part.split(';')[0].strip().lower()
+        for part in accept_encoding.split(',')
+        if not part.strip().endswith(';q=0')
+    }
+    if brotli is not None and 'br' in offered:
+        return 'br'
+    if 'gzip' in offered:
+        return 'gzip'
+    return None
+
+
+def stream_compressed(chunks, encoding):
+    """Compress a streamed body chunk by chunk"""
+    if encoding == 'br':
+        compressor = brotli.Compressor()
+        for chunk in chunks:
+            data = compressor.process(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+            if data:
+                yield data
+        yield compressor.finish()
+    else:
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+        for chunk in chunks:
+            data = compressor.compress(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+
+
+def compress_response(response, accept_encoding, min_size=1024):
+    """
+    Compress a Flask response for the client when it is worth it
+    (use from an after_request hook)
+    """
+    if response.status_code < 200 or response.status_code >= 300:
+        return response
+    if 'Content-Encoding' in response.headers:
+        return response
+
+    encoding = choose_encoding(accept_encoding or '')
+    if encoding is None:
+        return response
+
+    response.headers.add('Vary', 'Accept-Encoding')
+
+    if response.is_streamed:
+        # Size is unknown up front; streamed bodies are the big ones anyway
+        response.response = stream_compressed(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+        if encoding == 'br':
+            data = brotli.compress(data, quality=4)
+        else:
+            data = gzip.compress(data, compresslevel=6)
+        response.set_data(data)
+
+    response.headers['Content-Encoding'] = encoding
+    return response
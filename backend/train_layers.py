@@ -0,0 +1,170 @@
+"""
+Refit the department and priority heads on CLS embeddings taken after fewer
+BERT layers, and report what each depth costs in accuracy and saves in latency
+
+    python train_layers.py                             # layers 2 4 6 8 10 12, report only
+    python train_layers.py --layers 4 6 12 --publish   # also add them to the model registry
+    python train_layers.py --csv labeled.csv           # columns: description, category, priority
+
+Every depth is embedded in the same pass over the data. With --publish each
+depth becomes a registry version (layer6-20240501-120000, ...) with an
+encoder.json; activating one (POST /api/admin/models/activate) switches
+every worker to that depth without a restart.
+"""
+from datetime import datetime
+import statistics
+import tempfile
+import argparse
+import sqlite3
+import random
+import json
+import time
+import csv
+import os
+
+import joblib
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import LabelEncoder
+
+from model_registry import ModelRegistry, ENCODER_FILE
+from models import Database
+
+
+def load_labeled(db_path=None, csv_path=None, limit=None, seed=0):
+    """(descriptions, departments, priorities) from a CSV file or the tickets table"""
+    if csv_path:
+        with open(csv_path, newline='', encoding='utf-8') as f:
+            rows = [(row['description'], row['category'], row['priority']) for row in csv.DictReader(f)]
+    else:
+        conn = sqlite3.connect(Database(db_path).db_path)
+        rows = conn.execute('SELECT description, category, priority FROM tickets').fetchall()
+        conn.close()
+
+    random.Random(seed).shuffle(rows)
+    if limit:
+        rows = rows[:limit]
+    return [list(column) for column in zip(*rows)] if rows else ([], [], [])
+
+
+def fit_heads(embeddings, departments, priorities):
+    """LabelEncoder + LogisticRegression for department and priority"""
+    heads = {}
+    for name, labels in (('dept', departments), ('prio', priorities)):
+        encoder = LabelEncoder()
+        model = LogisticRegression(max_iter=1000)
+        model.fit(embeddings, encoder.fit_transform(labels))
+        heads[f'{name}_model'] = model
+        heads[f'{name}_encoder'] = encoder
+    return heads
+
+
+def accuracy(heads, embeddings, departments, priorities):
+    """Share of correct departments and priorities"""
+    dept = heads['dept_encoder'].inverse_transform(heads['dept_model'].predict(embeddings))
+    prio = heads['prio_encoder'].inverse_transform(heads['prio_model'].predict(embeddings))
+    return (
+        sum(p == t for p, t in zip(dept, departments)) / len(departments),
+        sum(p == t for p, t in zip(prio, priorities)) / len(priorities),
+    )
+
+
+def single_latency(predictor, heads, layer, texts):
+    """p50 milliseconds for one request: clean, embed after `layer` layers, both heads"""
+    timings = []
+    for text in texts:
+        started = time.perf_counter()
+        embedding = predictor.get_bert_embedding(predictor.clean_text(text), layer=layer)
+        heads['dept_model'].predict_proba(embedding)
+        heads['prio_model'].predict_proba(embedding)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def publish(registry, layer, heads, info):
+    """Add one depth's heads to the registry as a new version"""
+    version = f"layer{layer}-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}"
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, obj in heads.items():
+            joblib.dump(obj, os.path.join(tmp_dir, f'{name}.pkl'))
+        with open(os.path.join(tmp_dir, ENCODER_FILE), 'w') as f:
+            json.dump({'layer': layer, **info}, f, indent=2)
+        registry.publish(version, tmp_dir)
+    return version
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Train classifier heads per BERT depth')
+    parser.add_argument('--db', default='database/ticket_system.db', help='Labeled tickets (relative to backend/)')
+    parser.add_argument('--csv', help='Labeled CSV instead of the database')
+    parser.add_argument('--layers', type=int, nargs='+', default=[2, 4, 6, 8, 10, 12])
+    parser.add_argument('--limit', type=int, help='Use at most this many tickets')
+    parser.add_argument('--test-size', type=float, default=0.2)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--latency-samples', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--publish', action='store_true', help='Add every depth to the model registry')
+    parser.add_argument('--output', help='Write the report as JSON')
+    args = parser.parse_args()
+
+    texts, departments, priorities = load_labeled(args.db, args.csv, args.limit, args.seed)
+    if len(set(departments)) < 2 or len(set(priorities)) < 2:
+        raise SystemExit('❌ Need labeled tickets with at least two departments and two priorities')
+
+    # Imported here so --help works without loading BERT
+    from ml_predictor import TicketPredictor
+
+    predictor = TicketPredictor()
+    layers = sorted({layer for layer in args.layers if 1 <= layer <= predictor.num_layers})
+
+    print(f"\n🔄 Embedding {len(texts):,} tickets at layers {', '.join(map(str, layers))}...")
+    started = time.time()
+    embeddings = predictor.embed_layers(texts, layers, args.batch_size)
+    print(f"✅ Embedded in {time.time() - started:.1f}s")
+
+    indices = list(range(len(texts)))
+    try:
+        train_idx, test_idx = train_test_split(indices, test_size=args.test_size,
+                                               random_state=args.seed, stratify=departments)
+    except ValueError:
+        # A department with a single ticket can't be stratified
+        train_idx, test_idx = train_test_split(indices, test_size=args.test_size, random_state=args.seed)
+
+    def pick(values, idx):
+        return [values[i] for i in idx]
+
+    latency_texts = pick(texts, test_idx)[:args.latency_samples]
+    registry = ModelRegistry()
+    report = {}
+
+    for layer in layers:
+        print(f"\n🧪 Layer {layer}: fitting heads...")
+        heads = fit_heads(embeddings[layer][train_idx], pick(departments, train_idx), pick(priorities, train_idx))
+        dept_accuracy, prio_accuracy = accuracy(heads, embeddings[layer][test_idx],
+                                                pick(departments, test_idx), pick(priorities, test_idx))
+        report[layer] = {
+            'dept_accuracy': round(dept_accuracy, 4),
+            'prio_accuracy': round(prio_accuracy, 4),
+            'p50_latency_ms': round(single_latency(predictor, heads, layer, latency_texts), 2),
+            'trained_on': len(train_idx),
+        }
+        if args.publish:
+            report[layer]['version'] = publish(registry, layer, heads, report[layer])
+
+    full = report[layers[-1]]['p50_latency_ms']
+
+    print("\n" + "=" * 64)
+    print("📈 Speed vs accuracy by encoder depth")
+    print("=" * 64)
+    print(f"{'layers':>6}{'dept acc':>11}{'prio acc':>11}{'p50 ms':>10}{'speedup':>10}   version")
+    for layer, row in report.items():
+        print(f"{layer:>6}{row['dept_accuracy']:>11.1%}{row['prio_accuracy']:>11.1%}"
+              f"{row['p50_latency_ms']:>10.1f}{full / row['p50_latency_ms']:>9.1f}x   {row.get('version', '-')}")
+
+    if args.publish:
+        print("\n✅ Published. Activate a depth with POST /api/admin/models/activate {\"version\": ...}")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({str(layer): row for layer, row in report.items()}, f, indent=2)
+        print(f"✅ Report written to {args.output}")
+    print()
@@ -163,7 +163,7 @@ function filterUsers() {
 // ==================== LOAD TICKETS DATA ====================
 async function loadTicketsData() {
     try {
-        const response = await fetch(`${API_URL}/admin/tickets`, {
+        const response = await fetch(`${API_URL}/admin/tickets?format=compact`, {
             headers: {
                 'Authorization': 'Bearer admin_token'
             }
@@ -173,8 +173,11 @@ async function loadTicketsData() {
             throw new Error('Failed to load tickets');
         }
 
+        // Compact format: column names once, then one array per ticket
         const data = await response.json();
-        allTickets = data.tickets || [];
+        allTickets = (data.rows || []).map(row =>
+            Object.fromEntries(data.columns.map((column, i) => [column, row[i]]))
+        );
         
         // ==================== SORT BY PRIORITY ====================
         allTickets.sort((a, b) => {
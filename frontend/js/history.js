@@ -12,6 +12,7 @@ if (!token) {
 // Global variables
 let allTickets = [];
 let filteredTickets = [];
+let archivePage = 0;
 
 // Initialize page
 document.addEventListener('DOMContentLoaded', () => {
@@ -53,6 +54,9 @@ function setupEventListeners() {
     // Export
     document.getElementById('exportBtn').addEventListener('click', exportToCSV);
 
+    // Archived tickets
+    document.getElementById('loadOlderBtn').addEventListener('click', loadOlderTickets);
+
     // Modal
     document.getElementById('closeModal').addEventListener('click', closeModal);
     document.getElementById('ticketModal').addEventListener('click', (e) => {
@@ -107,6 +111,7 @@ async function loadTickets() {
         filteredTickets = [...allTickets];
         
         loadingState.style.display = 'none';
+        document.getElementById('loadOlderBtn').style.display = 'inline-block';
 
         if (allTickets.length === 0) {
             emptyState.style.display = 'block';
@@ -123,6 +128,48 @@ async function loadTickets() {
     }
 }
 
+// Load the next page of archived tickets
+async function loadOlderTickets() {
+    const loadOlderBtn = document.getElementById('loadOlderBtn');
+
+    try {
+        loadOlderBtn.disabled = true;
+        loadOlderBtn.textContent = 'Loading...';
+
+        const response = await fetch(`${API_URL}/tickets/archive?page=${archivePage + 1}`, {
+            headers: {
+                'Authorization': `Bearer ${token}`
+            }
+        });
+
+        if (!response.ok) throw new Error('Failed to load older tickets');
+
+        const data = await response.json();
+        archivePage = data.page;
+        allTickets = allTickets.concat(data.tickets || []);
+
+        // Archived tickets are older than the default date range
+        document.getElementById('startDate').value = '';
+
+        if (allTickets.length > 0) {
+            document.getElementById('emptyState').style.display = 'none';
+            document.getElementById('ticketsTimeline').style.display = 'flex';
+        }
+
+        applyFilters();
+        updateStats();
+
+        loadOlderBtn.style.display = data.has_more ? 'inline-block' : 'none';
+
+    } catch (error) {
+        console.error('Error loading older tickets:', error);
+        alert('Failed to load older tickets');
+    } finally {
+        loadOlderBtn.disabled = false;
+        loadOlderBtn.textContent = 'Load Older Tickets';
+    }
+}
+
 // Apply filters
 function applyFilters() {
     const searchTerm = document.getElementById('searchInput').value.toLowerCase();